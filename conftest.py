@@ -0,0 +1,10 @@
+import pytest
+
+
+@pytest.fixture(autouse=True, scope='session')
+def temporary_cache_dir(django_test_environment):
+    """Кэши тестов - во временном каталоге, см. core.testing."""
+    from core.testing import temporary_cache_dir
+
+    with temporary_cache_dir():
+        yield
@@ -20,7 +20,7 @@ def mixer():
 @pytest.fixture
 def post(user):
     image = tempfile.NamedTemporaryFile(suffix=".jpg").name
-    return Post.objects.create(text='Тестовый пост 1', author=user, image=image)
+    return Post.objects.create(text='Тестовый пост 1', author=user, image=image, is_published=True)
 
 
 @pytest.fixture
@@ -31,17 +31,17 @@ def group():
 @pytest.fixture
 def post_with_group(user, group):
     image = tempfile.NamedTemporaryFile(suffix=".jpg").name
-    return Post.objects.create(text='Тестовый пост 2', author=user, group=group, image=image)
+    return Post.objects.create(text='Тестовый пост 2', author=user, group=group, image=image, is_published=True)
 
 
 @pytest.fixture
 def few_posts_with_group(mixer, user, group):
     """Return one record with the same author and group."""
-    posts = mixer.cycle(20).blend(Post, author=user, group=group)
+    posts = mixer.cycle(20).blend(Post, author=user, group=group, is_published=True)
     return posts[0]
 
 
 @pytest.fixture
 def another_few_posts_with_group_with_follower(mixer, user, another_user, group):
     mixer.blend('posts.Follow', user=user, author=another_user)
-    mixer.cycle(20).blend(Post, author=another_user, group=group)
+    mixer.cycle(20).blend(Post, author=another_user, group=group, is_published=True)
@@ -0,0 +1,234 @@
+"""
+Кэш в памяти процесса с бюджетом в байтах и вытеснением по LRU.
+В отличие от LocMemCache считает не записи, а размер значений,
+вытесняет ровно самые давние и ведёт счётчики по префиксам ключей.
+"""
+import pickle
+import re
+import threading
+import time
+from collections import Counter, OrderedDict
+
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+
+# Хранилища общие для всех экземпляров с одним LOCATION: Django
+# создаёт по экземпляру бэкенда на поток.
+_stores = {}
+_stores_lock = threading.Lock()
+
+# Префикс для счётчиков: 'generation', 'search', 'post_card',
+# 'sorl-thumbnail', а у cache_page - 'cache_page' и 'cache_header'.
+KEY_PREFIX_PATTERN = r'(?:views\.decorators\.cache\.)?([^:|.]+)'
+
+
+class _Store:
+    def __init__(self):
+        # ключ -> (pickle значения, срок, префикс, размер)
+        self.data = OrderedDict()
+        self.size = 0
+        self.lock = threading.Lock()
+        self.hits = Counter()
+        self.misses = Counter()
+        self.evictions = Counter()
+        self.expirations = Counter()
+
+
+class MemoryCache(BaseCache):
+    """
+    OPTIONS:
+    MAX_BYTES - бюджет на сумму размеров ключей и значений (в pickle);
+    KEY_PREFIX_PATTERN - регулярное выражение, первая группа которого
+    даёт префикс ключа для счётчиков.
+    Срок жизни (TIMEOUT) у каждой записи свой и от порядка вытеснения
+    не зависит: истёкшая запись удаляется при обращении к ней.
+    """
+
+    def __init__(self, location, params):
+        super().__init__(params)
+        options = params.get('OPTIONS', {})
+        self.max_bytes = int(options.get('MAX_BYTES', 64 * 1024 * 1024))
+        self._prefix_pattern = re.compile(
+            options.get('KEY_PREFIX_PATTERN', KEY_PREFIX_PATTERN)
+        )
+        with _stores_lock:
+            self._store = _stores.setdefault(location, _Store())
+
+    def _prefix(self, key):
+        match = self._prefix_pattern.match(str(key))
+        return match.group(1) if match else ''
+
+    def _get_entry(self, key, prefix, now):
+        """Запись или None; попадание поднимает её в конец очереди."""
+        store = self._store
+        entry = store.data.get(key)
+        if entry is not None and entry[1] is not None and entry[1] <= now:
+            self._remove(key)
+            store.expirations[prefix] += 1
+            entry = None
+        if entry is None:
+            store.misses[prefix] += 1
+            return None
+        store.data.move_to_end(key)
+        store.hits[prefix] += 1
+        return entry
+
+    def _remove(self, key):
+        entry = self._store.data.pop(key, None)
+        if entry is not None:
+            self._store.size -= entry[3]
+        return entry
+
+    def _put(self, key, data, timeout, prefix):
+        store = self._store
+        size = len(key) + len(data)
+        self._remove(key)
+        if size > self.max_bytes:
+            return
+        expires = self.get_backend_timeout(timeout)
+        store.data[key] = (data, expires, prefix, size)
+        store.size += size
+        if store.size > self.max_bytes:
+            self._cull()
+
+    def _cull(self):
+        # Только с головы очереди: полный обход ради истёкших записей
+        # стоил бы O(n) на каждую запись в заполненный кэш.
+        store = self._store
+        now = time.time()
+        while store.size > self.max_bytes:
+            _, (_, expires, prefix, size) = store.data.popitem(last=False)
+            store.size -= size
+            if expires is not None and expires <= now:
+                store.expirations[prefix] += 1
+            else:
+                store.evictions[prefix] += 1
+
+    def get(self, key, default=None, version=None):
+        prefix = self._prefix(key)
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        with self._store.lock:
+            entry = self._get_entry(key, prefix, time.time())
+        if entry is None:
+            return default
+        return pickle.loads(entry[0])
+
+    def get_many(self, keys, version=None):
+        found = {}
+        now = time.time()
+        with self._store.lock:
+            for original in keys:
+                key = self.make_key(original, version=version)
+                self.validate_key(key)
+                entry = self._get_entry(key, self._prefix(original), now)
+                if entry is not None:
+                    found[original] = entry[0]
+        return {key: pickle.loads(data) for key, data in found.items()}
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        prefix = self._prefix(key)
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        data = pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+        with self._store.lock:
+            self._put(key, data, timeout, prefix)
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        prefix = self._prefix(key)
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        data = pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+        with self._store.lock:
+            entry = self._store.data.get(key)
+            if entry is not None and (
+                entry[1] is None or entry[1] > time.time()
+            ):
+                return False
+            self._put(key, data, timeout, prefix)
+            return True
+
+    def incr(self, key, delta=1, version=None):
+        prefix = self._prefix(key)
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        with self._store.lock:
+            entry = self._get_entry(key, prefix, time.time())
+            if entry is None:
+                raise ValueError("Key '%s' not found" % key)
+            value = pickle.loads(entry[0]) + delta
+            data = pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+            size = len(key) + len(data)
+            self._store.data[key] = (data, entry[1], prefix, size)
+            self._store.size += size - entry[3]
+        return value
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        with self._store.lock:
+            entry = self._store.data.get(key)
+            if entry is None or (
+                entry[1] is not None and entry[1] <= time.time()
+            ):
+                return False
+            self._store.data[key] = (
+                entry[0], self.get_backend_timeout(timeout)
+            ) + entry[2:]
+            return True
+
+    def has_key(self, key, version=None):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        with self._store.lock:
+            entry = self._store.data.get(key)
+        return entry is not None and (
+            entry[1] is None or entry[1] > time.time()
+        )
+
+    def delete(self, key, version=None):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        with self._store.lock:
+            self._remove(key)
+
+    def delete_if(self, key, value, version=None):
+        """Удаляет key, только если там лежит value."""
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        with self._store.lock:
+            entry = self._store.data.get(key)
+            if entry is None or pickle.loads(entry[0]) != value:
+                return False
+            self._remove(key)
+        return True
+
+    def clear(self):
+        # Счётчики накопительные: L1 очищается при каждой инвалидации,
+        # и метрики не должны обнуляться вместе с ним.
+        store = self._store
+        with store.lock:
+            store.data.clear()
+            store.size = 0
+
+    def stats(self):
+        """Заполнение и счётчики по префиксам ключей - для метрик."""
+        store = self._store
+        with store.lock:
+            prefixes = sorted(
+                set(store.hits) | set(store.misses) | set(store.evictions)
+                | set(store.expirations)
+            )
+            return {
+                'entries': len(store.data),
+                'bytes': store.size,
+                'max_bytes': self.max_bytes,
+                'prefixes': {
+                    prefix: {
+                        'hits': store.hits[prefix],
+                        'misses': store.misses[prefix],
+                        'evictions': store.evictions[prefix],
+                        'expirations': store.expirations[prefix],
+                    }
+                    for prefix in prefixes
+                },
+            }
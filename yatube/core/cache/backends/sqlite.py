@@ -0,0 +1,321 @@
+"""
+Кэш в файле SQLite в режиме WAL: общий для всех процессов на машине.
+Записи вытесняются по давности использования, когда их суммарный
+размер превышает MAX_BYTES.
+"""
+import os
+import pickle
+import sqlite3
+import threading
+import time
+
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS cache (
+    key TEXT PRIMARY KEY,
+    value BLOB NOT NULL,
+    size INTEGER NOT NULL,
+    expires REAL,
+    accessed REAL NOT NULL
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS cache_accessed_idx ON cache (accessed);
+CREATE TABLE IF NOT EXISTS cache_size (
+    id INTEGER PRIMARY KEY CHECK (id = 0),
+    total INTEGER NOT NULL
+);
+INSERT OR IGNORE INTO cache_size (id, total) VALUES (0, 0);
+CREATE TRIGGER IF NOT EXISTS cache_size_insert AFTER INSERT ON cache
+BEGIN
+    UPDATE cache_size SET total = total + NEW.size WHERE id = 0;
+END;
+CREATE TRIGGER IF NOT EXISTS cache_size_update AFTER UPDATE OF size ON cache
+BEGIN
+    UPDATE cache_size SET total = total - OLD.size + NEW.size WHERE id = 0;
+END;
+CREATE TRIGGER IF NOT EXISTS cache_size_delete AFTER DELETE ON cache
+BEGIN
+    UPDATE cache_size SET total = total - OLD.size WHERE id = 0;
+END;
+'''
+
+UPSERT = '''
+INSERT INTO cache (key, value, size, expires, accessed)
+VALUES (?, ?, ?, ?, ?)
+ON CONFLICT (key) DO UPDATE SET
+    value = excluded.value,
+    size = excluded.size,
+    expires = excluded.expires,
+    accessed = excluded.accessed
+'''
+
+# Сколько ключей за раз уходит в IN (...): предел переменных SQLite.
+CHUNK_SIZE = 500
+
+
+class SQLiteCache(BaseCache):
+    """
+    LOCATION - путь к файлу базы. OPTIONS:
+    MAX_BYTES - бюджет на сумму размеров значений;
+    CULL_TO - до какой доли бюджета чистить при переполнении;
+    TOUCH_INTERVAL - раз в сколько секунд записывать в файл время
+    последних чтений: чтение не должно брать блокировку на запись.
+    """
+
+    def __init__(self, location, params):
+        super().__init__(params)
+        options = params.get('OPTIONS', {})
+        self.location = location
+        self.max_bytes = int(options.get('MAX_BYTES', 64 * 1024 * 1024))
+        self.cull_to = float(options.get('CULL_TO', 0.9))
+        self.touch_interval = float(options.get('TOUCH_INTERVAL', 1.0))
+        self._local = threading.local()
+        self._touched = {}
+        self._touched_lock = threading.Lock()
+        self._last_touch_flush = time.monotonic()
+
+    @property
+    def _connection(self):
+        # Соединение на поток; после fork процесс открывает своё.
+        connection = getattr(self._local, 'connection', None)
+        if connection is None or self._local.pid != os.getpid():
+            directory = os.path.dirname(self.location)
+            if directory:
+                os.makedirs(directory, mode=0o700, exist_ok=True)
+            connection = sqlite3.connect(
+                self.location, timeout=30, isolation_level=None,
+                check_same_thread=False
+            )
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.execute('PRAGMA synchronous=NORMAL')
+            connection.executescript(SCHEMA)
+            self._local.connection = connection
+            self._local.pid = os.getpid()
+        return connection
+
+    def _dump(self, value):
+        data = pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+        return data, len(data)
+
+    def _touch(self, keys, now):
+        """Запоминает чтения; в файл они уходят пачкой раз в интервал."""
+        with self._touched_lock:
+            for key in keys:
+                self._touched[key] = now
+            if time.monotonic() - self._last_touch_flush < self.touch_interval:
+                return
+            touched, self._touched = self._touched, {}
+            self._last_touch_flush = time.monotonic()
+        self._connection.executemany(
+            'UPDATE cache SET accessed = ? WHERE key = ?',
+            [(stamp, key) for key, stamp in touched.items()]
+        )
+
+    def _fetch(self, keys, now):
+        found = {}
+        connection = self._connection
+        for start in range(0, len(keys), CHUNK_SIZE):
+            chunk = keys[start:start + CHUNK_SIZE]
+            rows = connection.execute(
+                'SELECT key, value FROM cache WHERE key IN (%s) '
+                'AND (expires IS NULL OR expires > ?)'
+                % ', '.join('?' * len(chunk)),
+                (*chunk, now)
+            )
+            for key, value in rows:
+                found[key] = pickle.loads(value)
+        if found:
+            self._touch(found, now)
+        return found
+
+    def _store(self, items, timeout, now):
+        expires = self.get_backend_timeout(timeout)
+        connection = self._connection
+        connection.execute('BEGIN IMMEDIATE')
+        try:
+            connection.executemany(UPSERT, [
+                (key, data, size, expires, now)
+                for key, (data, size) in items
+            ])
+            self._cull(connection, now)
+        except BaseException:
+            connection.execute('ROLLBACK')
+            raise
+        connection.execute('COMMIT')
+
+    def _cull(self, connection, now):
+        """Вытесняет истёкшие, затем самые давние записи сверх бюджета."""
+        (total,) = connection.execute(
+            'SELECT total FROM cache_size WHERE id = 0'
+        ).fetchone()
+        if total <= self.max_bytes:
+            return
+        connection.execute(
+            'DELETE FROM cache WHERE expires IS NOT NULL AND expires <= ?',
+            (now,)
+        )
+        (total,) = connection.execute(
+            'SELECT total FROM cache_size WHERE id = 0'
+        ).fetchone()
+        excess = total - self.max_bytes * self.cull_to
+        if excess <= 0:
+            return
+        # Самые давние записи, пока их сумма не покроет превышение.
+        connection.execute(
+            'DELETE FROM cache WHERE key IN ('
+            'SELECT key FROM (SELECT key, size, SUM(size) OVER '
+            '(ORDER BY accessed, key) AS running FROM cache) '
+            'WHERE running - size < ?)',
+            (excess,)
+        )
+
+    def get(self, key, default=None, version=None):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        return self._fetch([key], time.time()).get(key, default)
+
+    def get_many(self, keys, version=None):
+        made = {self.make_key(key, version=version): key for key in keys}
+        for key in made:
+            self.validate_key(key)
+        found = self._fetch(list(made), time.time())
+        return {made[key]: value for key, value in found.items()}
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        self._store([(key, self._dump(value))], timeout, time.time())
+
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None):
+        items = []
+        for key, value in data.items():
+            key = self.make_key(key, version=version)
+            self.validate_key(key)
+            items.append((key, self._dump(value)))
+        if items:
+            self._store(items, timeout, time.time())
+        return []
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        data, size = self._dump(value)
+        now = time.time()
+        connection = self._connection
+        connection.execute('BEGIN IMMEDIATE')
+        try:
+            added = connection.execute(
+                'INSERT INTO cache (key, value, size, expires, accessed) '
+                'VALUES (?, ?, ?, ?, ?) '
+                'ON CONFLICT (key) DO UPDATE SET value = excluded.value, '
+                'size = excluded.size, expires = excluded.expires, '
+                'accessed = excluded.accessed '
+                'WHERE cache.expires IS NOT NULL AND cache.expires <= ?',
+                (key, data, size, self.get_backend_timeout(timeout), now, now)
+            ).rowcount
+            if added:
+                self._cull(connection, now)
+        except BaseException:
+            connection.execute('ROLLBACK')
+            raise
+        connection.execute('COMMIT')
+        return bool(added)
+
+    def incr(self, key, delta=1, version=None):
+        """Атомарно: чтение и запись в одной транзакции на запись."""
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        now = time.time()
+        connection = self._connection
+        connection.execute('BEGIN IMMEDIATE')
+        try:
+            row = connection.execute(
+                'SELECT value FROM cache WHERE key = ? '
+                'AND (expires IS NULL OR expires > ?)',
+                (key, now)
+            ).fetchone()
+            if row is None:
+                raise ValueError("Key '%s' not found" % key)
+            value = pickle.loads(row[0]) + delta
+            data, size = self._dump(value)
+            connection.execute(
+                'UPDATE cache SET value = ?, size = ?, accessed = ? '
+                'WHERE key = ?',
+                (data, size, now, key)
+            )
+        except BaseException:
+            connection.execute('ROLLBACK')
+            raise
+        connection.execute('COMMIT')
+        return value
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        now = time.time()
+        return bool(self._connection.execute(
+            'UPDATE cache SET expires = ?, accessed = ? WHERE key = ? '
+            'AND (expires IS NULL OR expires > ?)',
+            (self.get_backend_timeout(timeout), now, key, now)
+        ).rowcount)
+
+    def has_key(self, key, version=None):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        return self._connection.execute(
+            'SELECT 1 FROM cache WHERE key = ? '
+            'AND (expires IS NULL OR expires > ?)',
+            (key, time.time())
+        ).fetchone() is not None
+
+    def delete(self, key, version=None):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        self._connection.execute('DELETE FROM cache WHERE key = ?', (key,))
+
+    def delete_if(self, key, value, version=None):
+        """
+        Удаляет key, только если там лежит value: сравнение и удаление -
+        один запрос, между ними никто не вклинится.
+        """
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        return bool(self._connection.execute(
+            'DELETE FROM cache WHERE key = ? AND value = ?',
+            (key, self._dump(value)[0])
+        ).rowcount)
+
+    def delete_many(self, keys, version=None):
+        keys = [self.make_key(key, version=version) for key in keys]
+        for key in keys:
+            self.validate_key(key)
+        connection = self._connection
+        connection.execute('BEGIN IMMEDIATE')
+        try:
+            for start in range(0, len(keys), CHUNK_SIZE):
+                chunk = keys[start:start + CHUNK_SIZE]
+                connection.execute(
+                    'DELETE FROM cache WHERE key IN (%s)'
+                    % ', '.join('?' * len(chunk)),
+                    chunk
+                )
+        except BaseException:
+            connection.execute('ROLLBACK')
+            raise
+        connection.execute('COMMIT')
+
+    def clear(self):
+        self._connection.execute('DELETE FROM cache')
+
+    def stats(self):
+        """Заполнение файла - для метрик."""
+        entries, size = self._connection.execute(
+            'SELECT (SELECT COUNT(*) FROM cache), total '
+            'FROM cache_size WHERE id = 0'
+        ).fetchone()
+        return {'entries': entries, 'bytes': size, 'max_bytes': self.max_bytes}
+
+    def close(self, **kwargs):
+        # Соединения живут весь процесс: открывать файл на каждый
+        # запрос дороже, чем держать его.
+        pass
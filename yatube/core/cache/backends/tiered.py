@@ -0,0 +1,211 @@
+"""
+Двухуровневый кэш: L1 в памяти процесса перед общим L2.
+Чтение сначала смотрит L1, промах идёт в L2 и оседает в L1.
+Процессы узнают об изменениях через общий счётчик версий в файле,
+отображённом в память: при его смене L1 процесса очищается целиком.
+"""
+import fcntl
+import mmap
+import os
+import struct
+import tempfile
+import threading
+
+from django.core.cache import caches
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+
+COUNTER = struct.Struct('<Q')
+
+# Последняя увиденная версия для каждого L1 процесса.
+_seen_versions = {}
+_channels = {}
+_channels_lock = threading.Lock()
+
+
+class InvalidationChannel:
+    """
+    Счётчик версий в файле, общий для процессов машины. Чтение - это
+    чтение 8 байт из mmap, без системных вызовов; увеличение - под flock.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.pid = None
+
+    def _open(self):
+        if self.pid == os.getpid():
+            return
+        # После fork дескриптор общий с родителем, и flock его
+        # не отличает: каждый процесс открывает файл сам.
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, mode=0o700, exist_ok=True)
+        fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o600)
+        fcntl.flock(fd, fcntl.LOCK_EX)
+        try:
+            if os.fstat(fd).st_size < COUNTER.size:
+                os.ftruncate(fd, COUNTER.size)
+        finally:
+            fcntl.flock(fd, fcntl.LOCK_UN)
+        self.fd = fd
+        self.map = mmap.mmap(fd, COUNTER.size)
+        self.pid = os.getpid()
+
+    def version(self):
+        self._open()
+        return COUNTER.unpack_from(self.map)[0]
+
+    def bump(self):
+        self._open()
+        fcntl.flock(self.fd, fcntl.LOCK_EX)
+        try:
+            version = COUNTER.unpack_from(self.map)[0] + 1
+            COUNTER.pack_into(self.map, 0, version)
+        finally:
+            fcntl.flock(self.fd, fcntl.LOCK_UN)
+        return version
+
+
+def get_channel(path):
+    with _channels_lock:
+        if path not in _channels:
+            _channels[path] = InvalidationChannel(path)
+        return _channels[path]
+
+
+class TieredCache(BaseCache):
+    """
+    OPTIONS:
+    L1, L2 - псевдонимы кэшей из CACHES: свой у процесса и общий;
+    L1_TIMEOUT - сколько секунд значение живёт в L1: потолок
+    устаревания для записей set/add, которые канал не оповещают;
+    CHANNEL - путь к файлу счётчика версий.
+    incr/decr, delete, touch и clear меняют значения, которые могут
+    лежать в L1 других процессов, и поэтому увеличивают версию.
+    """
+
+    def __init__(self, location, params):
+        super().__init__(params)
+        options = params.get('OPTIONS', {})
+        self.l1_alias = options.get('L1', 'local')
+        self.l2_alias = options.get('L2', 'shared')
+        self.l1_timeout = options.get('L1_TIMEOUT', 10)
+        self.channel = get_channel(options.get('CHANNEL') or os.path.join(
+            tempfile.gettempdir(), 'yatube_cache.version'
+        ))
+        self.l1 = caches[self.l1_alias]
+        self.l2 = caches[self.l2_alias]
+
+    def _sync(self):
+        """Очищает L1, если с прошлого обращения кто-то увеличил версию."""
+        version = self.channel.version()
+        if _seen_versions.get(self.l1_alias) != version:
+            self.l1.clear()
+            _seen_versions[self.l1_alias] = version
+
+    def invalidate(self):
+        """Сбрасывает L1 всех процессов."""
+        _seen_versions[self.l1_alias] = self.channel.bump()
+        self.l1.clear()
+
+    def _timeouts(self, timeout):
+        if timeout is DEFAULT_TIMEOUT:
+            timeout = self.default_timeout
+        if timeout is None:
+            return None, self.l1_timeout
+        return timeout, min(timeout, self.l1_timeout)
+
+    def get(self, key, default=None, version=None):
+        self.validate_key(self.make_key(key, version=version))
+        self._sync()
+        missing = object()
+        value = self.l1.get(key, missing, version=version)
+        if value is missing:
+            value = self.l2.get(key, missing, version=version)
+            if value is missing:
+                return default
+            self.l1.set(key, value, self.l1_timeout, version=version)
+        return value
+
+    def get_many(self, keys, version=None):
+        self._sync()
+        found = self.l1.get_many(keys, version=version)
+        missing = [key for key in keys if key not in found]
+        if missing:
+            shared = self.l2.get_many(missing, version=version)
+            if shared:
+                self.l1.set_many(shared, self.l1_timeout, version=version)
+            found.update(shared)
+        return found
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        timeout, l1_timeout = self._timeouts(timeout)
+        self._sync()
+        self.l2.set(key, value, timeout, version=version)
+        self.l1.set(key, value, l1_timeout, version=version)
+
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None):
+        timeout, l1_timeout = self._timeouts(timeout)
+        self._sync()
+        # CacheStatTracker debug_toolbar вместо списка возвращает None.
+        failed = self.l2.set_many(data, timeout, version=version) or []
+        # Не записанное в L2 не должно читаться из L1.
+        self.l1.set_many(
+            {key: value for key, value in data.items() if key not in failed},
+            l1_timeout, version=version
+        )
+        return failed
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        timeout, l1_timeout = self._timeouts(timeout)
+        self._sync()
+        added = self.l2.add(key, value, timeout, version=version)
+        if added:
+            self.l1.set(key, value, l1_timeout, version=version)
+        return added
+
+    def incr(self, key, delta=1, version=None):
+        try:
+            return self.l2.incr(key, delta, version=version)
+        finally:
+            self.invalidate()
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        timeout = self._timeouts(timeout)[0]
+        try:
+            return self.l2.touch(key, timeout, version=version)
+        finally:
+            self.invalidate()
+
+    def has_key(self, key, version=None):
+        self._sync()
+        # has_key здесь - метод кэша, а не dict: 'in' не передаёт version.
+        return (
+            self.l1.has_key(key, version=version)  # noqa: W601
+            or self.l2.has_key(key, version=version)  # noqa: W601
+        )
+
+    def delete(self, key, version=None):
+        self.l2.delete(key, version=version)
+        self.invalidate()
+
+    def delete_if(self, key, value, version=None):
+        # Сбрасывается только свой L1: запись, которую другие процессы
+        # не читали (блокировка), не стоит сброса L1 у всех.
+        self.l1.delete(key, version=version)
+        return self.l2.delete_if(key, value, version=version)
+
+    def delete_many(self, keys, version=None):
+        self.l2.delete_many(keys, version=version)
+        self.invalidate()
+
+    def clear(self):
+        self.l2.clear()
+        self.invalidate()
+
+    def stats(self):
+        return {
+            'l1': self.l1_alias,
+            'l2': self.l2_alias,
+            'version': self.channel.version(),
+        }
@@ -0,0 +1,78 @@
+import hashlib
+from functools import wraps
+
+from django.utils.cache import has_vary_header, patch_vary_headers
+
+from ..holes import PUNCH_HOLES, fill_holes
+from .generations import get_generations
+from .stampede import get_or_build
+
+
+def _generation_prefix(key_prefix, generation):
+    """key_prefix и текущие поколения: имя или кортеж имён."""
+    if generation is None:
+        return key_prefix
+    names = (generation,) if isinstance(generation, str) else generation
+    generations = get_generations(names)
+    return '.'.join(
+        [key_prefix] + [str(generations[name]) for name in names]
+    )
+
+
+def _cacheable(response):
+    # Те же условия, что у UpdateCacheMiddleware.
+    return (
+        response.status_code == 200
+        and not response.streaming
+        and not (response.cookies and has_vary_header(response, 'Cookie'))
+        and 'private' not in response.get('Cache-Control', ())
+    )
+
+
+def hole_punched_cache_page(timeout, key_prefix, generation=None,
+                            stale=None, beta=None):
+    """
+    Одна закэшированная страница на всех пользователей: ключ - только
+    адрес и поколения, без Cookie. Куски, зависящие от пользователя
+    ({% hole %}), в кэше хранятся метками и отрисовываются для каждого
+    запроса после чтения (core.holes). Перестройку защищает
+    core.cache.stampede: страницу строит один процесс, остальные отдают
+    устаревшую копию до stale секунд после timeout.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if request.method not in ('GET', 'HEAD'):
+                return view(request, *args, **kwargs)
+            url = hashlib.md5(request.build_absolute_uri().encode())
+            key = (
+                f'hole_page:{_generation_prefix(key_prefix, generation)}:'
+                f'{url.hexdigest()}'
+            )
+
+            def build():
+                setattr(request, PUNCH_HOLES, True)
+                try:
+                    response = view(request, *args, **kwargs)
+                finally:
+                    delattr(request, PUNCH_HOLES)
+                if hasattr(response, 'render') and callable(response.render):
+                    response = response.render()
+                return response
+
+            response = get_or_build(
+                key, build, timeout, stale, beta,
+                # Cookie общей страницы достались бы всем.
+                should_cache=lambda response: (
+                    _cacheable(response) and not response.cookies
+                )
+            )
+            if response.streaming:
+                return response
+            response.content = fill_holes(
+                request, response.content.decode(response.charset)
+            )
+            patch_vary_headers(response, ('Cookie',))
+            return response
+        return wrapper
+    return decorator
@@ -0,0 +1,53 @@
+"""Поколения кэша: номер версии входит в ключ закэшированных данных."""
+import time
+
+from django.core.cache import cache
+
+
+def _generation_key(name):
+    return f'generation:{name}'
+
+
+def _seed():
+    # Если счётчик вытеснен из кэша, новое значение всё равно больше
+    # прежнего, и старые записи не оживут.
+    return time.time_ns()
+
+
+def get_many_with_generations(keys, names):
+    """
+    Значения keys и поколения names одним запросом get_many.
+    Возвращает пару словарей (значения, поколения).
+    """
+    generation_keys = {_generation_key(name): name for name in names}
+    found = cache.get_many(list(keys) + list(generation_keys))
+    generations = {}
+    for key, name in generation_keys.items():
+        if key not in found:
+            cache.add(key, _seed(), None)
+            found[key] = cache.get(key)
+        generations[name] = found[key]
+    values = {key: found[key] for key in keys if key in found}
+    return values, generations
+
+
+def get_generations(names):
+    """Текущие поколения для набора имён одним запросом к кэшу."""
+    return get_many_with_generations((), names)[1]
+
+
+def get_generation(name):
+    return get_generations([name])[name]
+
+
+def bump_generation(name):
+    """Инвалидирует всё, что закэшировано под поколением name."""
+    key = _generation_key(name)
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.set(key, _seed(), None)
+        # Прежнее значение могло остаться в L1 других процессов.
+        invalidate = getattr(cache, 'invalidate', None)
+        if invalidate is not None:
+            invalidate()
@@ -0,0 +1,106 @@
+"""
+Защита от лавины промахов: одновременно запись перестраивает
+один процесс, остальные отдают устаревшую копию или ждут его.
+Пока копия свежая, её перестройка может начаться раньше срока
+с вероятностью, растущей к его концу (XFetch): тогда запись
+обычно обновлена до того, как истечёт.
+"""
+import math
+import random
+import time
+import uuid
+
+from django.conf import settings
+from django.core.cache import cache
+
+# Как часто ждущий запрос проверяет, не появилась ли запись.
+WAIT_INTERVAL = 0.05
+
+
+def _lock_key(key):
+    return f'rebuild:{key}'
+
+
+def _acquire(key):
+    """Берёт блокировку перестройки key; возвращает её метку или None."""
+    token = uuid.uuid4().hex
+    if cache.add(_lock_key(key), token, settings.CACHE_REBUILD_LOCK_TIMEOUT):
+        return token
+    return None
+
+
+def _release(key, token):
+    """
+    Снимает свою блокировку. Сравнение и удаление атомарны в L2: чужую
+    блокировку, взятую после истечения нашей, не снять. Кэш без
+    delete_if оставляет блокировку истечь.
+    """
+    delete_if = getattr(cache, 'delete_if', None)
+    if delete_if is not None:
+        delete_if(_lock_key(key), token)
+
+
+def _is_fresh(entry, beta):
+    """
+    XFetch: срок как бы сдвигается вперёд на случайную долю времени
+    перестройки delta, так что раньше срока запись перестраивается редко.
+    """
+    _, expires, delta = entry
+    early = -delta * beta * math.log(1 - random.random())
+    return time.time() + early < expires
+
+
+def store(key, value, timeout, delta, stale=None):
+    """
+    Кладёт value вместе со сроком свежести и временем перестройки.
+    В кэше запись лежит ещё stale секунд после срока - устаревшей.
+    """
+    if stale is None:
+        stale = settings.CACHE_STALE_TIMEOUT
+    if timeout is None:
+        cache.set(key, (value, math.inf, delta), None)
+        return
+    cache.set(key, (value, time.time() + timeout, delta), timeout + stale)
+
+
+def _wait(key):
+    """Ждёт, пока перестройку закончит другой процесс."""
+    deadline = time.monotonic() + settings.CACHE_REBUILD_LOCK_TIMEOUT
+    while time.monotonic() < deadline:
+        time.sleep(WAIT_INTERVAL)
+        entry = cache.get(key)
+        if entry is not None:
+            return entry
+    return None
+
+
+def get_or_build(key, build, timeout, stale=None, beta=None,
+                 should_cache=None):
+    """
+    Значение key из кэша или build(). Свежее значение отдаётся сразу.
+    Устаревшее (до stale секунд после timeout) или выпавшее в XFetch
+    перестраивает тот, кто взял блокировку; остальные отдают имеющееся.
+    При полном промахе остальные ждут перестройки, но не дольше
+    CACHE_REBUILD_LOCK_TIMEOUT - потом строят сами.
+    should_cache(value) решает, класть ли результат в кэш.
+    """
+    if beta is None:
+        beta = settings.CACHE_XFETCH_BETA
+    entry = cache.get(key)
+    if entry is not None and _is_fresh(entry, beta):
+        return entry[0]
+    token = _acquire(key)
+    if token is None:
+        if entry is None:
+            entry = _wait(key)
+        if entry is not None:
+            return entry[0]
+    try:
+        started = time.monotonic()
+        value = build()
+        if should_cache is None or should_cache(value):
+            store(key, value, timeout, time.monotonic() - started, stale)
+        return value
+    finally:
+        if token is not None:
+            _release(key, token)
@@ -0,0 +1,58 @@
+"""
+Дырки в общей закэшированной странице: куски, которые зависят от
+пользователя (шапка, переключатель лент, кнопки подписки). Пока
+страница строится для кэша, на месте куска остаётся метка; после
+чтения из кэша метки заменяются куском, отрисованным для запроса.
+"""
+import re
+
+from django.core import signing
+from django.template.loader import render_to_string
+
+# Атрибут запроса: страница строится для общего кэша.
+PUNCH_HOLES = '_punch_holes'
+
+SALT = 'core.holes'
+MARKER = re.compile(r'<!--hole:([\w\-.:]+)-->')
+
+_holes = {}
+
+
+def register_hole(name, template_name):
+    """
+    Регистрирует дырку name: функция (request, **params) возвращает
+    контекст для template_name. params - простые значения из шаблона,
+    они хранятся в метке.
+    """
+    def decorator(function):
+        _holes[name] = (template_name, function)
+        return function
+    return decorator
+
+
+def render_hole(name, request, params):
+    template_name, function = _holes[name]
+    return render_to_string(
+        template_name, function(request, **params), request=request
+    )
+
+
+def hole_marker(name, params):
+    # Подпись не даёт подставить метку через пользовательский текст.
+    return f'<!--hole:{signing.dumps([name, params], salt=SALT)}-->'
+
+
+def fill_holes(request, content):
+    """Заменяет метки в content кусками, отрисованными для request."""
+    def replace(match):
+        try:
+            name, params = signing.loads(match.group(1), salt=SALT)
+        except signing.BadSignature:
+            return ''
+        return render_hole(name, request, params)
+    return MARKER.sub(replace, content)
+
+
+@register_hole('header', 'includes/header.html')
+def header(request):
+    return {}
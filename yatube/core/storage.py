@@ -0,0 +1,86 @@
+import hashlib
+import os
+import posixpath
+import re
+import tempfile
+
+from django.core.exceptions import SuspiciousFileOperation
+from django.core.files import File
+from django.core.files.storage import FileSystemStorage
+from django.utils.deconstruct import deconstructible
+
+HASHED_NAME = re.compile(r'(?:^|/)[0-9a-f]{2}/[0-9a-f]{64}(?:\.\w+)?$')
+
+# Временные файлы загрузки лежат рядом с итоговыми (rename не выходит
+# за пределы диска), по префиксу их находит сборщик мусора.
+TEMP_PREFIX = '.upload-'
+
+
+def is_hashed_name(name):
+    return bool(HASHED_NAME.search(name))
+
+
+def _extension(name):
+    extension = os.path.splitext(name)[1].lower()
+    return extension if re.fullmatch(r'\.\w+', extension) else ''
+
+
+def _hashed_name(name, hexdigest):
+    return posixpath.join(
+        posixpath.dirname(name), hexdigest[:2], hexdigest + _extension(name)
+    )
+
+
+def hashed_name(name, content):
+    """Имя, под которым ContentAddressedStorage сохранит content."""
+    digest = hashlib.sha256()
+    for chunk in File(content).chunks():
+        digest.update(chunk)
+    return _hashed_name(name, digest.hexdigest())
+
+
+@deconstructible
+class ContentAddressedStorage(FileSystemStorage):
+    """
+    Файлы хранятся под sha256 своего содержимого:
+    <каталог>/<2 знака хэша>/<хэш>.<расширение>.
+    Одинаковые загрузки дают одно имя, повторная запись ничего не меняет.
+    """
+
+    def save(self, name, content, max_length=None):
+        if name is None:
+            name = content.name
+        if not hasattr(content, 'chunks'):
+            content = File(content, name)
+        temp_dir = self.path(posixpath.dirname(name))
+        os.makedirs(temp_dir, exist_ok=True)
+        digest = hashlib.sha256()
+        with tempfile.NamedTemporaryFile(
+            dir=temp_dir, prefix=TEMP_PREFIX, delete=False
+        ) as temp:
+            try:
+                for chunk in content.chunks():
+                    digest.update(chunk)
+                    temp.write(chunk)
+            except BaseException:
+                os.unlink(temp.name)
+                raise
+        name = _hashed_name(name, digest.hexdigest())
+        if max_length is not None and len(name) > max_length:
+            os.unlink(temp.name)
+            raise SuspiciousFileOperation(
+                f'Storage name "{name}" is longer than {max_length}.'
+            )
+        full_path = self.path(name)
+        if os.path.exists(full_path):
+            os.unlink(temp.name)
+            # Свежая дата защищает файл от сборщика мусора,
+            # пока новый пост с ним ещё не сохранён.
+            os.utime(full_path)
+            return name
+        os.makedirs(os.path.dirname(full_path), exist_ok=True)
+        os.chmod(temp.name, self.file_permissions_mode or 0o644)
+        # Одновременная запись того же содержимого безопасна:
+        # replace атомарен, а байты совпадают.
+        os.replace(temp.name, full_path)
+        return name
@@ -0,0 +1,17 @@
+from core.holes import PUNCH_HOLES, hole_marker, render_hole
+from django import template
+from django.utils.safestring import mark_safe
+
+register = template.Library()
+
+
+@register.simple_tag(takes_context=True)
+def hole(context, name, **params):
+    """
+    Кусок страницы, зависящий от пользователя. Для общего кэша
+    на его месте выводится метка, иначе - сам кусок.
+    """
+    request = context.get('request')
+    if getattr(request, PUNCH_HOLES, False):
+        return mark_safe(hole_marker(name, params))
+    return render_hole(name, request, params)
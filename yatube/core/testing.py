@@ -0,0 +1,52 @@
+"""
+Тесты работают с кэшами во временном каталоге: файлы кэша
+dev-сервера они не читают и не очищают.
+"""
+import os
+import shutil
+import tempfile
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.test import override_settings
+from django.test.runner import DiscoverRunner
+
+
+def caches_in(directory):
+    """CACHES из настроек, где файлы кэшей перенесены в directory."""
+    caches = {}
+    for alias, params in settings.CACHES.items():
+        params = {**params, 'OPTIONS': dict(params.get('OPTIONS', {}))}
+        if params['BACKEND'].endswith('SQLiteCache'):
+            params['LOCATION'] = os.path.join(
+                directory, os.path.basename(params['LOCATION'])
+            )
+        if 'CHANNEL' in params['OPTIONS']:
+            params['OPTIONS']['CHANNEL'] = os.path.join(
+                directory, os.path.basename(params['OPTIONS']['CHANNEL'])
+            )
+        caches[alias] = params
+    return caches
+
+
+@contextmanager
+def temporary_cache_dir():
+    directory = tempfile.mkdtemp(prefix='yatube_cache_')
+    try:
+        with override_settings(CACHES=caches_in(directory)):
+            yield directory
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+class TemporaryCacheRunner(DiscoverRunner):
+    """manage.py test с кэшами во временном каталоге."""
+
+    def setup_test_environment(self, **kwargs):
+        super().setup_test_environment(**kwargs)
+        self._cache_dir = temporary_cache_dir()
+        self._cache_dir.__enter__()
+
+    def teardown_test_environment(self, **kwargs):
+        self._cache_dir.__exit__(None, None, None)
+        super().teardown_test_environment(**kwargs)
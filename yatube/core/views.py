@@ -1,4 +1,9 @@
+from django.conf import settings
+from django.contrib.admin.views.decorators import staff_member_required
+from django.core.cache import caches
+from django.http import JsonResponse
 from django.shortcuts import render
+from sorl.thumbnail import default as thumbnail
 
 
 def page_not_found(request, exception):
@@ -21,3 +26,19 @@ def server_error(request):
 
 def permission_denied(request, exception):
     return render(request, 'core/403.html', status=403)
+
+
+@staff_member_required
+def cache_stats(request):
+    """
+    Заполнение и счётчики кэшей, которые их ведут, в JSON; LRU
+    хранилища миниатюр - под ключом thumbnail_kvstore.
+    """
+    stats = {
+        alias: caches[alias].stats()
+        for alias in settings.CACHES
+        if hasattr(caches[alias], 'stats')
+    }
+    if hasattr(thumbnail.kvstore, 'stats'):
+        stats['thumbnail_kvstore'] = thumbnail.kvstore.stats()
+    return JsonResponse(stats)
@@ -0,0 +1,93 @@
+"""
+Валидаторы для условных GET (django.views.decorators.http.condition):
+ETag считается до шаблонов одним агрегатным запросом. Страницы зависят
+от пользователя (шапка, форма, кнопки), поэтому его id входит в ETag.
+Данные не из постов (имена, группы) ловят поколения кэша: они есть
+в памяти и запросов не стоят. Last-Modified не отдаётся: дата правки
+не меняется ни при входе, ни при переименовании автора комментария,
+и If-Modified-Since получал бы 304 на изменившуюся страницу.
+"""
+import hashlib
+
+from core.cache.generations import get_generations
+from django.db.models import Count, Max, Q
+
+from .models import Group, Post, User
+
+
+def _etag(request, values, generation_names):
+    generations = get_generations(generation_names)
+    user = request.user.pk if request.user.is_authenticated else 0
+    raw = ':'.join(str(part) for part in (
+        user, *values, *(generations[name] for name in generation_names)
+    ))
+    return hashlib.md5(raw.encode()).hexdigest()
+
+
+def post_detail_etag(request, post_id):
+    state = (
+        Post.objects.filter(pk=post_id)
+        .values('updated', 'group_id', 'author__stats__published_posts_count')
+        .first()
+    )
+    if state is None:
+        return None
+    # Имена авторов комментариев и группа меняются без правки поста.
+    return _etag(
+        request, [
+            state['updated'].isoformat(),
+            state['author__stats__published_posts_count'],
+        ],
+        ['users', f'group:{state["group_id"]}']
+    )
+
+
+def _feed_aggregates(prefix):
+    """
+    Последняя правка и число опубликованных постов ленты: удаление
+    поста меняет число, даже если последняя правка осталась прежней.
+    """
+    published = Q(**{f'{prefix}__is_published': True})
+    return {
+        'updated': Max(f'{prefix}__updated', filter=published),
+        'count': Count(f'{prefix}__id', filter=published),
+    }
+
+
+def group_posts_etag(request, slug):
+    group = (
+        Group.objects.filter(slug=slug)
+        .annotate(**_feed_aggregates('groups'))
+        .values('pk', 'updated', 'count')
+        .first()
+    )
+    if group is None:
+        return None
+    # Карточки показывают имена авторов.
+    return _etag(
+        request, [group['updated'], group['count']],
+        [f'group:{group["pk"]}', 'users']
+    )
+
+
+def profile_etag(request, username):
+    author = (
+        User.objects.filter(username=username)
+        .annotate(**_feed_aggregates('posts'))
+        .values(
+            'pk', 'updated', 'count',
+            'stats__followers_count', 'stats__following_count'
+        )
+        .first()
+    )
+    if author is None:
+        return None
+    # Подписка читателя меняет followers_count, а с ним и ETag.
+    return _etag(
+        request, [
+            author['updated'], author['count'],
+            author['stats__followers_count'],
+            author['stats__following_count'],
+        ],
+        [f'user:{author["pk"]}', 'groups']
+    )
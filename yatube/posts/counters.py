@@ -0,0 +1,115 @@
+from django.db.models import Count, F, IntegerField, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from .models import AuthorStats, Comment, Follow, Post, User
+
+RECONCILE_BATCH_SIZE = 500
+
+
+def _count_of(model, field, manager='objects'):
+    """Подзапрос COUNT(*) строк model, у которых field = внешний pk."""
+    return Coalesce(
+        Subquery(
+            getattr(model, manager)
+            .filter(**{field: OuterRef('pk')})
+            .order_by()
+            .values(field)
+            .annotate(total=Count('pk'))
+            .values('total'),
+            output_field=IntegerField()
+        ),
+        0
+    )
+
+
+def real_author_stats(user_id):
+    return {
+        'posts_count': Post.objects.filter(author_id=user_id).count(),
+        'published_posts_count': Post.published.filter(
+            author_id=user_id
+        ).count(),
+        'followers_count': Follow.objects.filter(author_id=user_id).count(),
+        'following_count': Follow.objects.filter(user_id=user_id).count(),
+    }
+
+
+def bump_author_stats(user_id, **deltas):
+    """
+    Атомарно сдвигает счётчики пользователя на deltas.
+    Уменьшение никогда не создаёт строку: при каскадном удалении
+    пользователя его счётчики уже могут быть удалены.
+    """
+    updates = {
+        field: F(field) + delta for field, delta in deltas.items() if delta
+    }
+    if not updates:
+        return
+    if AuthorStats.objects.filter(user_id=user_id).update(**updates):
+        return
+    if all(delta <= 0 for delta in deltas.values()):
+        return
+    # Строки ещё нет - считаем честно, текущая запись уже в базе.
+    AuthorStats.objects.get_or_create(
+        user_id=user_id, defaults=real_author_stats(user_id)
+    )
+
+
+def bump_comments_count(post_id, delta):
+    Post.objects.filter(pk=post_id).update(
+        comments_count=F('comments_count') + delta, updated=timezone.now()
+    )
+
+
+def reconcile_author_stats():
+    """Пересчитывает счётчики пользователей, возвращает число исправленных."""
+    AuthorStats.objects.bulk_create(
+        (
+            AuthorStats(user_id=user_id)
+            for user_id in User.objects.filter(
+                stats__isnull=True
+            ).values_list('pk', flat=True).iterator()
+        ),
+        batch_size=RECONCILE_BATCH_SIZE,
+        ignore_conflicts=True
+    )
+    fields = (
+        'posts_count', 'published_posts_count',
+        'followers_count', 'following_count',
+    )
+    users = User.objects.annotate(
+        real_posts_count=_count_of(Post, 'author'),
+        real_published_posts_count=_count_of(Post, 'author', 'published'),
+        real_followers_count=_count_of(Follow, 'author'),
+        real_following_count=_count_of(Follow, 'user'),
+    ).values_list(
+        'pk',
+        *(f'real_{field}' for field in fields),
+        *(f'stats__{field}' for field in fields)
+    )
+    drifted = []
+    for pk, *counts in users.iterator():
+        real, stored = counts[:len(fields)], counts[len(fields):]
+        if real != stored:
+            drifted.append(AuthorStats(user_id=pk, **dict(zip(fields, real))))
+    AuthorStats.objects.bulk_update(
+        drifted, fields, batch_size=RECONCILE_BATCH_SIZE
+    )
+    return len(drifted)
+
+
+def reconcile_comments_count():
+    """Пересчитывает comments_count постов, возвращает число исправленных."""
+    posts = Post.objects.annotate(
+        real_comments_count=_count_of(Comment, 'post')
+    ).exclude(
+        comments_count=F('real_comments_count')
+    ).values_list('pk', 'real_comments_count')
+    drifted = [
+        Post(pk=pk, comments_count=count)
+        for pk, count in posts.iterator()
+    ]
+    Post.objects.bulk_update(
+        drifted, ['comments_count'], batch_size=RECONCILE_BATCH_SIZE
+    )
+    return len(drifted)
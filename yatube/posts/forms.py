@@ -1,5 +1,7 @@
 from django import forms
+from django.core.files.uploadedfile import UploadedFile
 
+from .images import prepare_post_image
 from .models import Comment, Post
 
 
@@ -14,6 +16,12 @@ class PostForm(forms.ModelForm):
             'group': 'выберите группу из списка или оставьте пустым',
         }
 
+    def clean_image(self):
+        image = self.cleaned_data.get('image')
+        if isinstance(image, UploadedFile):
+            return prepare_post_image(image)
+        return image
+
 
 class CommentForm(forms.ModelForm):
     class Meta:
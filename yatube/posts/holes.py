@@ -0,0 +1,17 @@
+"""Куски лент, которые зависят от пользователя: см. core.holes."""
+from core.holes import register_hole
+
+from .models import Follow
+
+
+@register_hole('switcher', 'posts/includes/switcher.html')
+def switcher(request):
+    return {}
+
+
+@register_hole('follow_buttons', 'posts/includes/follow_buttons.html')
+def follow_buttons(request, author):
+    following = request.user.is_authenticated and Follow.objects.filter(
+        user=request.user, author__username=author
+    ).exists()
+    return {'author': author, 'following': following}
@@ -0,0 +1,115 @@
+"""Подготовка загруженной картинки поста перед сохранением."""
+import base64
+import warnings
+from io import BytesIO
+
+from django import forms
+from django.conf import settings
+from django.core.files.uploadedfile import SimpleUploadedFile
+from PIL import Image, ImageFilter, ImageOps
+
+EXIF_ORIENTATION = 0x0112
+
+# Заглушка - картинка 16x16 в WebP, в base64 это около сотни байт.
+PLACEHOLDER_SIZE = 16
+
+# Форматы, которые пересохраняются; остальные (GIF и т.п.) хранятся как есть.
+SAVE_OPTIONS = {
+    'JPEG': {'quality': 90, 'optimize': True, 'progressive': True},
+    'PNG': {'optimize': True},
+    'WEBP': {'quality': 90},
+}
+
+
+def _open(upload):
+    """Открывает картинку: читается только заголовок, пиксели - нет."""
+    upload.seek(0)
+    try:
+        with warnings.catch_warnings():
+            warnings.simplefilter('error', Image.DecompressionBombWarning)
+            return Image.open(upload)
+    except (Image.DecompressionBombError, Image.DecompressionBombWarning):
+        raise forms.ValidationError(
+            'Картинка слишком большая.', code='image_too_large'
+        )
+
+
+def _target_size(size, box):
+    """Размер, вписанный в box с сохранением пропорций; не больше size."""
+    width, height = size
+    scale = min(box[0] / width, box[1] / height, 1)
+    return max(1, round(width * scale)), max(1, round(height * scale))
+
+
+def prepare_post_image(upload):
+    """
+    Ограничивает загрузку POST_IMAGE_MAX_SIZE и разворачивает по EXIF.
+    Слишком большие по числу пикселей картинки отклоняются до раскодирования.
+    JPEG раскодируется сразу уменьшенным (draft), дальше - reduce.
+    Возвращает upload без изменений, если трогать нечего.
+    """
+    image = _open(upload)
+    width, height = image.size
+    if width * height > settings.POST_IMAGE_MAX_PIXELS:
+        raise forms.ValidationError(
+            'Картинка слишком большая: не больше %(limit)s мегапикселей.',
+            code='image_too_large',
+            params={'limit': settings.POST_IMAGE_MAX_PIXELS // 10 ** 6},
+        )
+    image_format = image.format
+    if image_format not in SAVE_OPTIONS or getattr(image, 'is_animated', 0):
+        return upload
+    orientation = image.getexif().get(EXIF_ORIENTATION, 1)
+    box = settings.POST_IMAGE_MAX_SIZE
+    if orientation in (5, 6, 7, 8):
+        # Поворот на 90 градусов: ограничение применяется к повёрнутой.
+        box = box[::-1]
+    target = _target_size(image.size, box)
+    if target == image.size and orientation == 1:
+        return upload
+    # JPEG сразу раскодируется в 1/2-1/8 размера, но не меньше target.
+    image.draft(image.mode, target)
+    image = ImageOps.exif_transpose(image)
+    image.thumbnail(settings.POST_IMAGE_MAX_SIZE, reducing_gap=2.0)
+    if image_format == 'JPEG' and image.mode not in ('RGB', 'L'):
+        image = image.convert('RGB')
+    buffer = BytesIO()
+    image.save(
+        buffer, image_format,
+        icc_profile=image.info.get('icc_profile'),
+        **SAVE_OPTIONS[image_format]
+    )
+    return SimpleUploadedFile(
+        upload.name,
+        buffer.getvalue(),
+        content_type=Image.MIME[image_format],
+    )
+
+
+def image_metadata(file):
+    """
+    Размеры картинки после поворота по EXIF, размытая заглушка
+    (data: URI) и преобладающий цвет для карточки, пока грузится миниатюра.
+    """
+    file.seek(0)
+    with Image.open(file) as image:
+        width, height = image.size
+        if image.getexif().get(EXIF_ORIENTATION, 1) in (5, 6, 7, 8):
+            width, height = height, width
+        # Заглушке хватает JPEG, раскодированного в 1/8 размера.
+        image.draft('RGB', (PLACEHOLDER_SIZE * 2, PLACEHOLDER_SIZE * 2))
+        small = ImageOps.exif_transpose(image).convert('RGB')
+    small.thumbnail((PLACEHOLDER_SIZE, PLACEHOLDER_SIZE))
+    color = small.resize((1, 1), Image.BOX).getpixel((0, 0))
+    buffer = BytesIO()
+    small.filter(ImageFilter.GaussianBlur(1)).save(
+        buffer, 'WEBP', quality=50
+    )
+    return {
+        'image_width': width,
+        'image_height': height,
+        'image_placeholder': 'data:image/webp;base64,' + (
+            base64.b64encode(buffer.getvalue()).decode()
+        ),
+        'image_color': '#%02x%02x%02x' % color,
+    }
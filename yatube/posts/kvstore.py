@@ -0,0 +1,77 @@
+from core.cache.lru import LRUCache
+from sorl.thumbnail.conf import settings
+from sorl.thumbnail.images import deserialize_image_file
+from sorl.thumbnail.kvstores import cached_db_kvstore
+from sorl.thumbnail.kvstores.base import add_prefix
+from sorl.thumbnail.models import KVStore as KVStoreModel
+
+
+class KVStore(cached_db_kvstore.KVStore):
+    """
+    Хранилище sorl-thumbnail: LRU в памяти процесса перед кэшем и базой.
+    В LRU попадают только найденные записи - миниатюру, построенную
+    другим процессом, следующий запрос найдёт в базе.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.lru = LRUCache(settings.THUMBNAIL_KVSTORE_LRU_SIZE)
+
+    def clear(self, delete_thumbnails=False):
+        super().clear(delete_thumbnails)
+        self.lru.clear()
+
+    def stats(self):
+        """Попадания и промахи LRU - для /metrics/cache/."""
+        return self.lru.stats()
+
+    def _get_raw(self, key):
+        value = self.lru.get(key)
+        if value is None:
+            value = super()._get_raw(key)
+            if value is not None:
+                self.lru.set(key, value)
+        return value
+
+    def _set_raw(self, key, value):
+        super()._set_raw(key, value)
+        self.lru.set(key, value)
+
+    def _delete_raw(self, *keys):
+        super()._delete_raw(*keys)
+        for key in keys:
+            self.lru.delete(key)
+
+    def get_many(self, image_files):
+        """
+        Известные хранилищу картинки из image_files: {key: ImageFile}.
+        Промахи LRU ищутся одним get_many в кэше и одним запросом в базу.
+        """
+        keys = {add_prefix(image_file.key): image_file.key
+                for image_file in image_files}
+        found = {}
+        for raw_key in keys:
+            value = self.lru.get(raw_key)
+            if value is not None:
+                found[raw_key] = value
+        missing = [raw_key for raw_key in keys if raw_key not in found]
+        if missing:
+            cached = self.cache.get_many(missing)
+            rest = [raw_key for raw_key in missing if raw_key not in cached]
+            if rest:
+                stored = dict(
+                    KVStoreModel.objects.filter(key__in=rest)
+                    .values_list('key', 'value')
+                )
+                self.cache.set_many(
+                    stored, settings.THUMBNAIL_CACHE_TIMEOUT
+                )
+                cached.update(stored)
+            for raw_key, value in cached.items():
+                if value != cached_db_kvstore.EMPTY_VALUE:
+                    found[raw_key] = value
+                    self.lru.set(raw_key, value)
+        return {
+            keys[raw_key]: deserialize_image_file(value)
+            for raw_key, value in found.items()
+        }
@@ -0,0 +1,71 @@
+import os
+import tempfile
+import time
+
+from core.cache.backends.sqlite import SQLiteCache
+from django.core.cache.backends.filebased import FileBasedCache
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.management.base import BaseCommand
+
+
+class Command(BaseCommand):
+    help = (
+        'Сравнивает бэкенды кэша на одних и тех же операциях: '
+        'LocMemCache, FileBasedCache и SQLiteCache.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--keys', type=int, default=1000)
+        parser.add_argument(
+            '--value-size', type=int, default=2048,
+            help='Размер значения в байтах: примерно фрагмент карточки'
+        )
+
+    def handle(self, *args, **options):
+        count = options['keys']
+        value = 'x' * options['value_size']
+        keys = [f'bench:{number}' for number in range(count)]
+        with tempfile.TemporaryDirectory() as directory:
+            backends = {
+                'locmem': LocMemCache('bench', {
+                    'OPTIONS': {'MAX_ENTRIES': count * 2},
+                }),
+                'filebased': FileBasedCache(
+                    os.path.join(directory, 'files'),
+                    {'OPTIONS': {'MAX_ENTRIES': count * 2}},
+                ),
+                'sqlite': SQLiteCache(
+                    os.path.join(directory, 'cache.sqlite3'), {}
+                ),
+            }
+            self.stdout.write(
+                f'{"backend":<12}{"set":>10}{"get":>10}'
+                f'{"get_many":>10}{"incr":>10}   мкс на ключ'
+            )
+            for name, backend in backends.items():
+                timings = self.measure(backend, keys, value)
+                self.stdout.write(f'{name:<12}' + ''.join(
+                    f'{elapsed / count * 10 ** 6:>10.1f}'
+                    for elapsed in timings
+                ))
+
+    def measure(self, backend, keys, value):
+        timings = []
+        started = time.perf_counter()
+        for key in keys:
+            backend.set(key, value)
+        timings.append(time.perf_counter() - started)
+        started = time.perf_counter()
+        for key in keys:
+            backend.get(key)
+        timings.append(time.perf_counter() - started)
+        started = time.perf_counter()
+        for start in range(0, len(keys), 20):
+            backend.get_many(keys[start:start + 20])
+        timings.append(time.perf_counter() - started)
+        backend.set('bench:counter', 0)
+        started = time.perf_counter()
+        for _ in keys:
+            backend.incr('bench:counter')
+        timings.append(time.perf_counter() - started)
+        return timings
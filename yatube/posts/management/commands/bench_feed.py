@@ -0,0 +1,85 @@
+import time
+import tracemalloc
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from posts.models import Group, Post
+
+User = get_user_model()
+
+
+class RollbackError(Exception):
+    """Откатывает транзакцию с засеянными данными."""
+
+
+class Command(BaseCommand):
+    help = (
+        'Сравнивает память и время выборки страницы ленты: полные строки '
+        'постов против проекции колонок карточки. Данные сеются во '
+        'временной транзакции и откатываются.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--posts', type=int, default=2000)
+        parser.add_argument(
+            '--text-kb', type=int, default=32,
+            help='Размер HTML каждого поста в килобайтах'
+        )
+        parser.add_argument('--repeat', type=int, default=50)
+
+    def handle(self, *args, **options):
+        try:
+            with transaction.atomic():
+                self.seed(options['posts'], options['text_kb'])
+                self.report(options['repeat'])
+                raise RollbackError
+        except RollbackError:
+            pass
+
+    def seed(self, count, text_kb):
+        author = User.objects.create_user(username='bench_feed_author')
+        group = Group.objects.create(
+            title='Bench', slug='bench-feed', description='x' * 1024
+        )
+        body = '<p>' + 'Длинный текст поста. ' * (text_kb * 1024 // 40)
+        Post.objects.bulk_create(
+            (
+                Post(
+                    author=author,
+                    group=group,
+                    text=body,
+                    text_html=body,
+                    description=body,
+                    excerpt=body[3:63],
+                    is_published=True,
+                )
+                for _ in range(count)
+            ),
+            batch_size=200
+        )
+
+    def measure(self, queryset, repeat):
+        per_page = settings.POSTS_PER_PAGE
+        tracemalloc.start()
+        list(queryset[:per_page])
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        started = time.perf_counter()
+        for _ in range(repeat):
+            list(queryset[:per_page])
+        elapsed = (time.perf_counter() - started) / repeat
+        return peak, elapsed
+
+    def report(self, repeat):
+        variants = (
+            ('full rows', Post.published.select_related('author', 'group')),
+            ('for_feed()', Post.published.for_feed()),
+        )
+        self.stdout.write(f'{"queryset":<12}{"peak KiB":>12}{"ms/page":>12}')
+        for name, queryset in variants:
+            peak, elapsed = self.measure(queryset, repeat)
+            self.stdout.write(
+                f'{name:<12}{peak / 1024:>12.1f}{elapsed * 1000:>12.2f}'
+            )
@@ -0,0 +1,77 @@
+import time
+
+from django.core.management.base import BaseCommand
+from PIL import Image
+from posts.sorl_compat import encode_image
+from posts.thumbnails import THUMBNAIL_SPECS, _thumbnail_options
+from sorl.thumbnail import default
+from sorl.thumbnail.parsers import parse_geometry
+
+# Прежние размеры шаблонов: один JPEG на карточку и один на пост.
+LEGACY_SPECS = {
+    'legacy-card': ('700x700', {'padding': True, 'upscale': True}),
+    'legacy-detail': ('x750', {'crop': 'center', 'upscale': True}),
+}
+
+
+def synthetic_image(width, height):
+    """Шум поверх градиентов: сжимается примерно как фотография."""
+    gradient = Image.linear_gradient('L').resize((width, height))
+    noise = Image.effect_noise((width, height), 48)
+    return Image.merge(
+        'RGB', (gradient, noise, gradient.transpose(Image.ROTATE_180))
+    )
+
+
+class Command(BaseCommand):
+    help = (
+        'Сравнивает время построения и размер миниатюр: прежние JPEG '
+        'шаблонов против вариантов THUMBNAIL_SPECS (ширины и WebP).'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'images', nargs='*',
+            help='Файлы картинок; без них - синтетические 2400x1600 и 200x150'
+        )
+        parser.add_argument('--repeat', type=int, default=5)
+
+    def handle(self, *args, **options):
+        sources = [
+            (path, Image.open(path)) for path in options['images']
+        ] or [
+            ('synthetic 2400x1600', synthetic_image(2400, 1600)),
+            ('synthetic 200x150', synthetic_image(200, 150)),
+        ]
+        for label, image in sources:
+            image.load()
+            self.stdout.write(f'{label}:')
+            self.stdout.write(
+                f'{"variant":<18}{"size":>12}{"KiB":>10}{"ms":>10}'
+            )
+            for name, geometry, variant_options in self.variants():
+                size, length, elapsed = self.measure(
+                    image, geometry, variant_options, options['repeat']
+                )
+                self.stdout.write(
+                    f'{name:<18}{"x".join(map(str, size)):>12}'
+                    f'{length / 1024:>10.1f}{elapsed * 1000:>10.2f}'
+                )
+
+    def variants(self):
+        engine_defaults = default.backend.default_options
+        for name, (geometry, options) in LEGACY_SPECS.items():
+            yield name, geometry, {**engine_defaults, **options}
+        for name in THUMBNAIL_SPECS:
+            yield (name,) + _thumbnail_options(name)
+
+    def measure(self, image, geometry_string, options, repeat):
+        engine = default.engine
+        ratio = engine.get_image_ratio(image, options)
+        geometry = parse_geometry(geometry_string, ratio)
+        started = time.perf_counter()
+        for _ in range(repeat):
+            thumbnail = engine.create(image, geometry, options)
+            raw = encode_image(thumbnail, options)
+        elapsed = (time.perf_counter() - started) / repeat
+        return thumbnail.size, len(raw), elapsed
@@ -0,0 +1,147 @@
+import os
+import time
+
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand
+from posts.models import Post
+from sorl.thumbnail import default
+from sorl.thumbnail.conf import settings as thumbnail_settings
+from sorl.thumbnail.helpers import deserialize
+from sorl.thumbnail.images import deserialize_image_file
+from sorl.thumbnail.kvstores.base import add_prefix, del_prefix
+from sorl.thumbnail.models import KVStore as KVStoreModel
+
+IMAGES_DIR = Post._meta.get_field('image').upload_to.strip('/')
+THUMBNAILS_DIR = thumbnail_settings.THUMBNAIL_PREFIX.strip('/')
+
+
+def walk_files(root):
+    """Файлы под root по одному, без списка всего дерева: (путь, stat)."""
+    stack = [root]
+    while stack:
+        with os.scandir(stack.pop()) as entries:
+            for entry in entries:
+                if entry.is_dir(follow_symlinks=False):
+                    stack.append(entry.path)
+                elif entry.is_file(follow_symlinks=False):
+                    yield entry.path, entry.stat(follow_symlinks=False)
+
+
+def remove_empty_dirs(root):
+    for path, dirs, files in os.walk(root, topdown=False):
+        if path != root and not dirs and not files:
+            try:
+                os.rmdir(path)
+            except OSError:
+                pass
+
+
+class Command(BaseCommand):
+    help = (
+        'Удаляет из media картинки, на которые не ссылается ни один пост, '
+        'и миниатюры, которых нет в KV store у живых картинок.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dry-run', action='store_true',
+            help='Только посчитать, ничего не удалять'
+        )
+        parser.add_argument('--batch-size', type=int, default=500)
+        parser.add_argument(
+            '--min-age', type=int, default=60 * 60,
+            help='Не трогать файлы моложе стольких секунд: их могут '
+                 'сейчас загружать или строить'
+        )
+
+    def handle(self, *args, **options):
+        self.dry_run = options['dry_run']
+        self.batch_size = options['batch_size']
+        self.removed = self.reclaimed = 0
+        started = time.time()
+        newer_than = started - options['min_age']
+
+        live_images = set(
+            Post.objects.exclude(image='').exclude(image__isnull=True)
+            .values_list('image', flat=True).iterator()
+        )
+        live_thumbnails, dead_keys = self.scan_kvstore(live_images)
+        # Сначала записи KV store: файл без записи просто построится заново.
+        if not self.dry_run:
+            for start in range(0, len(dead_keys), self.batch_size):
+                default.kvstore._delete_raw(
+                    *dead_keys[start:start + self.batch_size]
+                )
+        scanned = 0
+        for directory, live in (
+            (IMAGES_DIR, live_images), (THUMBNAILS_DIR, live_thumbnails)
+        ):
+            root = default_storage.path(directory)
+            if not os.path.isdir(root):
+                continue
+            batch = []
+            for path, stat in walk_files(root):
+                scanned += 1
+                name = os.path.relpath(path, default_storage.location)
+                name = name.replace(os.sep, '/')
+                if name in live or stat.st_mtime > newer_than:
+                    continue
+                batch.append((path, stat.st_size))
+                if len(batch) >= self.batch_size:
+                    self.remove(batch)
+                    batch = []
+            self.remove(batch)
+            if not self.dry_run:
+                remove_empty_dirs(root)
+
+        prefix = 'Будет удалено' if self.dry_run else 'Удалено'
+        self.stdout.write(self.style.SUCCESS(
+            f'Просмотрено файлов: {scanned}. {prefix}: файлов - '
+            f'{self.removed}, байт - {self.reclaimed}, '
+            f'записей KV store - {len(dead_keys)} '
+            f'({time.time() - started:.1f} с)'
+        ))
+
+    def scan_kvstore(self, live_images):
+        """
+        Имена миниатюр живых картинок и ключи KV store мёртвых:
+        картинок без поста и их миниатюр.
+        """
+        names = {}
+        for key, value in (
+            KVStoreModel.objects
+            .filter(key__startswith=add_prefix('', 'image'))
+            .values_list('key', 'value').iterator()
+        ):
+            names[del_prefix(key)] = deserialize_image_file(value).name
+        live_thumbnails = set()
+        dead_keys = []
+        for key, value in (
+            KVStoreModel.objects
+            .filter(key__startswith=add_prefix('', 'thumbnails'))
+            .values_list('key', 'value').iterator()
+        ):
+            source_key = del_prefix(key)
+            thumbnail_keys = deserialize(value)
+            if names.get(source_key) in live_images:
+                live_thumbnails.update(
+                    names[thumbnail_key] for thumbnail_key in thumbnail_keys
+                    if thumbnail_key in names
+                )
+                continue
+            dead_keys.append(key)
+            dead_keys.append(add_prefix(source_key))
+            dead_keys.extend(
+                add_prefix(thumbnail_key) for thumbnail_key in thumbnail_keys
+            )
+        return live_thumbnails, dead_keys
+
+    def remove(self, batch):
+        for path, size in batch:
+            if not self.dry_run:
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    continue
+            self.removed += 1
+            self.reclaimed += size
@@ -0,0 +1,77 @@
+from core.cache.generations import bump_generation
+from core.storage import hashed_name, is_hashed_name
+from django.core.management.base import BaseCommand
+from posts.models import Post
+from sorl.thumbnail import delete as delete_thumbnails
+
+
+class Command(BaseCommand):
+    help = (
+        'Переносит картинки постов под хэш содержимого: одинаковые файлы '
+        'сливаются в один, старые копии и их миниатюры удаляются.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dry-run', action='store_true',
+            help='Только посчитать, ничего не менять'
+        )
+
+    def _rehash(self, storage, old_name, stored, dry_run):
+        """
+        Имя файла по хэшу содержимого и размер; копия под этим именем
+        пишется, если её нет. stored - уже сохранённые имена: в --dry-run
+        файлы не пишутся, и повтор иначе посчитался бы новым файлом.
+        Возвращает (имя, занятые новым файлом байты).
+        """
+        with storage.open(old_name) as content:
+            new_name = hashed_name(old_name, content)
+            if new_name in stored or storage.exists(new_name):
+                return new_name, 0
+            stored.add(new_name)
+            if not dry_run:
+                storage.save(old_name, content)
+            return new_name, content.size
+
+    def handle(self, *args, dry_run=False, **options):
+        storage = Post._meta.get_field('image').storage
+        posts = (
+            Post.objects.exclude(image='').exclude(image__isnull=True)
+            .only('id', 'image').order_by('pk')
+        )
+        renamed = {}
+        stored = set()
+        missing = updated = 0
+        old_bytes = new_bytes = 0
+        for post in posts.iterator():
+            old_name = post.image.name
+            if is_hashed_name(old_name):
+                continue
+            if old_name not in renamed:
+                if not storage.exists(old_name):
+                    missing += 1
+                    continue
+                old_bytes += storage.size(old_name)
+                renamed[old_name], size = self._rehash(
+                    storage, old_name, stored, dry_run
+                )
+                new_bytes += size
+            updated += 1
+            if not dry_run:
+                Post.objects.filter(pk=post.pk).update(
+                    image=renamed[old_name]
+                )
+                bump_generation(f'post:{post.pk}')
+        if not dry_run:
+            for old_name in renamed:
+                # Исходник, его запись в KV store и все его миниатюры.
+                delete_thumbnails(old_name)
+            if renamed:
+                bump_generation('posts')
+        prefix = 'Будет' if dry_run else 'Готово'
+        self.stdout.write(self.style.SUCCESS(
+            f'{prefix}: постов - {updated}, файлов - {len(renamed)}, '
+            f'уникальных - {len(set(renamed.values()))}, '
+            f'освобождено байт - {old_bytes - new_bytes}, '
+            f'без файла - {missing}'
+        ))
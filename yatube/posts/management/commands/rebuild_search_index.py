@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+from posts.search import fts_enabled, rebuild_index
+
+
+class Command(BaseCommand):
+    help = 'Заполняет полнотекстовый индекс постов заново'
+
+    def handle(self, *args, **options):
+        if not fts_enabled():
+            self.stdout.write(self.style.WARNING(
+                'FTS5 доступен только на SQLite, поиск работает через LIKE'
+            ))
+            return
+        indexed = rebuild_index()
+        self.stdout.write(self.style.SUCCESS(
+            f'Проиндексировано постов: {indexed}'
+        ))
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+from posts.counters import reconcile_author_stats, reconcile_comments_count
+
+
+class Command(BaseCommand):
+    help = 'Пересчитывает денормализованные счётчики постов и подписок'
+
+    def handle(self, *args, **options):
+        authors = reconcile_author_stats()
+        posts = reconcile_comments_count()
+        self.stdout.write(self.style.SUCCESS(
+            f'Исправлено счётчиков: пользователей - {authors}, '
+            f'постов - {posts}'
+        ))
@@ -0,0 +1,44 @@
+# Generated by Django 2.2.16 on 2026-10-18 18:09
+
+from django.db import migrations, models
+
+
+def fill_published_posts_count(apps, schema_editor):
+    AuthorStats = apps.get_model('posts', 'AuthorStats')
+    Post = apps.get_model('posts', 'Post')
+    for stats in AuthorStats.objects.iterator():
+        AuthorStats.objects.filter(pk=stats.pk).update(
+            published_posts_count=Post.objects.filter(
+                author_id=stats.pk, is_published=True
+            ).count()
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0020_counters'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='authorstats',
+            name='published_posts_count',
+            field=models.PositiveIntegerField(default=0, verbose_name='Опубликованных постов'),
+        ),
+        migrations.AddIndex(
+            model_name='post',
+            index=models.Index(fields=['is_published', '-pub_date', '-id'], name='post_published_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='post',
+            index=models.Index(fields=['author', 'is_published', '-pub_date', '-id'], name='post_author_published_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='post',
+            index=models.Index(fields=['group', 'is_published', '-pub_date', '-id'], name='post_group_published_idx'),
+        ),
+        migrations.RunPython(
+            fill_published_posts_count, migrations.RunPython.noop
+        ),
+    ]
@@ -0,0 +1,45 @@
+# Generated by Django 2.2.16 on 2026-10-18 18:13
+
+from django.db import migrations, models
+
+from posts.text import make_excerpt, sanitize_html
+
+
+def render_texts(apps, schema_editor):
+    Post = apps.get_model('posts', 'Post')
+    Comment = apps.get_model('posts', 'Comment')
+    for post in Post.objects.only('text').iterator():
+        Post.objects.filter(pk=post.pk).update(
+            text_html=sanitize_html(post.text),
+            excerpt=make_excerpt(post.text)
+        )
+    for comment in Comment.objects.only('text').iterator():
+        Comment.objects.filter(pk=comment.pk).update(
+            text_html=sanitize_html(comment.text)
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0023_post_fts'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='comment',
+            name='text_html',
+            field=models.TextField(blank=True, editable=False, verbose_name='Очищенный HTML комментария'),
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='excerpt',
+            field=models.CharField(blank=True, editable=False, max_length=255, verbose_name='Начало поста для ленты'),
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='text_html',
+            field=models.TextField(blank=True, editable=False, verbose_name='Очищенный HTML поста'),
+        ),
+        migrations.RunPython(render_texts, migrations.RunPython.noop),
+    ]
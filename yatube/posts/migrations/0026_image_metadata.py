@@ -0,0 +1,49 @@
+# Generated by Django 2.2.16 on 2026-10-18 18:28
+
+from django.core.exceptions import SuspiciousFileOperation
+from django.db import migrations, models
+
+from posts.images import image_metadata
+
+
+def fill_image_metadata(apps, schema_editor):
+    Post = apps.get_model('posts', 'Post')
+    posts = Post.objects.exclude(image='').exclude(image__isnull=True)
+    for post in posts.only('image').iterator():
+        try:
+            with post.image.open() as image:
+                metadata = image_metadata(image)
+        except (OSError, ValueError, SuspiciousFileOperation):
+            continue
+        Post.objects.filter(pk=post.pk).update(**metadata)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0025_content_addressed_images'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='post',
+            name='image_color',
+            field=models.CharField(blank=True, editable=False, max_length=7, verbose_name='Основной цвет картинки'),
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='image_height',
+            field=models.PositiveIntegerField(blank=True, editable=False, null=True, verbose_name='Высота картинки'),
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='image_placeholder',
+            field=models.TextField(blank=True, editable=False, verbose_name='Размытая заглушка картинки'),
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='image_width',
+            field=models.PositiveIntegerField(blank=True, editable=False, null=True, verbose_name='Ширина картинки'),
+        ),
+        migrations.RunPython(fill_image_metadata, migrations.RunPython.noop),
+    ]
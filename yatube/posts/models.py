@@ -1,11 +1,14 @@
 from ckeditor.fields import RichTextField
+from core.models import CreatedModel
+from core.storage import ContentAddressedStorage
 from django.contrib.auth import get_user_model
+from django.core.exceptions import SuspiciousFileOperation
 from django.db import models
 
-from core.models import CreatedModel
+from .images import image_metadata
+from .text import make_excerpt, sanitize_html
 from .validators import validate_not_empty
 
-
 User = get_user_model()
 
 
@@ -23,6 +26,46 @@ class Group(models.Model):
         verbose_name_plural = "Группы"
 
 
+# Колонки, которые выводит карточка ленты: без RichText-полей text,
+# text_html и description, которые весят килобайты на пост.
+FEED_FIELDS = (
+    'pub_date',
+    'excerpt',
+    'image',
+    'image_width',
+    'image_height',
+    'image_placeholder',
+    'image_color',
+    'is_published',
+    'author__username',
+    'author__first_name',
+    'author__last_name',
+    'group__title',
+    'group__slug',
+)
+
+
+IMAGE_METADATA_FIELDS = (
+    'image_width', 'image_height', 'image_placeholder', 'image_color'
+)
+# Счётчики меняются только через F() в posts.counters.
+COUNTER_FIELDS = ('comments_count',)
+
+
+class PostQuerySet(models.QuerySet):
+
+    def for_feed(self):
+        """Только то, что нужно карточкам ленты."""
+        return self.select_related('author', 'group').only(*FEED_FIELDS)
+
+
+class PublishedManager(models.Manager.from_queryset(PostQuerySet)):
+    """Только одобренные посты - для публичных лент и поиска."""
+
+    def get_queryset(self):
+        return super().get_queryset().filter(is_published=True)
+
+
 class Post(CreatedModel):
 
     text = RichTextField(
@@ -49,21 +92,129 @@ class Post(CreatedModel):
     image = models.ImageField(
         'Картинка',
         upload_to='posts/',
+        storage=ContentAddressedStorage(),
         blank=True,
         null=True
     )
     is_published = models.BooleanField(
         default=False,
     )
+    # Меняется и при комментариях: это версия страницы поста для ETag.
+    updated = models.DateTimeField('Дата изменения', auto_now=True)
+    comments_count = models.PositiveIntegerField(
+        'Количество комментариев',
+        default=0,
+        editable=False
+    )
+    text_html = models.TextField(
+        'Очищенный HTML поста',
+        blank=True,
+        editable=False
+    )
+    excerpt = models.CharField(
+        'Начало поста для ленты',
+        max_length=255,
+        blank=True,
+        editable=False
+    )
+    # Заполняются в save(), а не через width_field/height_field:
+    # те перечитывают файл при каждой загрузке поста без размеров.
+    image_width = models.PositiveIntegerField(
+        'Ширина картинки',
+        null=True,
+        blank=True,
+        editable=False
+    )
+    image_height = models.PositiveIntegerField(
+        'Высота картинки',
+        null=True,
+        blank=True,
+        editable=False
+    )
+    image_placeholder = models.TextField(
+        'Размытая заглушка картинки',
+        blank=True,
+        editable=False
+    )
+    image_color = models.CharField(
+        'Основной цвет картинки',
+        max_length=7,
+        blank=True,
+        editable=False
+    )
+
+    objects = PostQuerySet.as_manager()
+    published = PublishedManager()
 
     def __str__(self) -> str:
 
         return self.text[:15]
 
+    def save(self, *args, **kwargs):
+        # HTML чистится и режется один раз при сохранении,
+        # шаблоны только выводят готовые колонки.
+        self.text_html = sanitize_html(self.text)
+        self.excerpt = make_excerpt(self.text)
+        self.update_image_metadata()
+        update_fields = kwargs.get('update_fields')
+        if update_fields is None and not self._state.adding:
+            # Полное сохранение затёрло бы счётчики значениями
+            # из экземпляра, прочитанного до новых комментариев.
+            deferred = self.get_deferred_fields()
+            kwargs['update_fields'] = update_fields = {
+                field.attname for field in self._meta.concrete_fields
+                if not field.primary_key
+                and field.attname not in deferred
+                and field.name not in COUNTER_FIELDS
+            }
+        if update_fields is not None and 'text' in update_fields:
+            update_fields = {*update_fields, 'text_html', 'excerpt'}
+        if update_fields is not None and 'image' in update_fields:
+            update_fields = {*update_fields, *IMAGE_METADATA_FIELDS}
+        if update_fields is not None:
+            kwargs['update_fields'] = {*update_fields, 'updated'}
+        super().save(*args, **kwargs)
+
+    def update_image_metadata(self):
+        """
+        Размеры и заглушка считаются один раз: для новой загрузки
+        или если их ещё нет. Без картинки поля очищаются.
+        """
+        if not self.image:
+            self.image_width = self.image_height = None
+            self.image_placeholder = self.image_color = ''
+            return
+        stored = self.image._committed
+        if stored and self.image_placeholder:
+            return
+        try:
+            metadata = image_metadata(self.image)
+        except (OSError, ValueError, SuspiciousFileOperation):
+            return
+        finally:
+            if stored:
+                self.image.close()
+        for field, value in metadata.items():
+            setattr(self, field, value)
+
     class Meta:
         ordering = ["-pub_date"]
         verbose_name = "Пост"
         verbose_name_plural = "Посты"
+        indexes = [
+            models.Index(
+                fields=['is_published', '-pub_date', '-id'],
+                name='post_published_date_idx'
+            ),
+            models.Index(
+                fields=['author', 'is_published', '-pub_date', '-id'],
+                name='post_author_published_idx'
+            ),
+            models.Index(
+                fields=['group', 'is_published', '-pub_date', '-id'],
+                name='post_group_published_idx'
+            ),
+        ]
 
 
 class Comment(models.Model):
@@ -86,6 +237,11 @@ class Comment(models.Model):
         verbose_name='Текст комментария',
         help_text='Введите текст комментария'
     )
+    text_html = models.TextField(
+        'Очищенный HTML комментария',
+        blank=True,
+        editable=False
+    )
     created = models.DateTimeField(
         'Дата создания комментария',
         auto_now_add=True
@@ -95,10 +251,23 @@ class Comment(models.Model):
         verbose_name = 'Комментарий'
         verbose_name_plural = 'Комментарии'
         ordering = ["-created"]
+        indexes = [
+            models.Index(
+                fields=['post', '-created'],
+                name='comment_post_created_idx'
+            ),
+        ]
 
     def __str__(self):
         return self.text[:15]
 
+    def save(self, *args, **kwargs):
+        self.text_html = sanitize_html(self.text)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and 'text' in update_fields:
+            kwargs['update_fields'] = {*update_fields, 'text_html'}
+        super().save(*args, **kwargs)
+
 
 class Follow(models.Model):
     user = models.ForeignKey(
@@ -123,8 +292,82 @@ class Follow(models.Model):
                 name='unique_following'
             )
         ]
+        indexes = [
+            models.Index(
+                fields=['user', 'author'],
+                name='follow_user_author_idx'
+            ),
+        ]
 
     def __str__(self):
         return (
             f'Follower-{self.user.username}, Following-{self.author.username}'
         )
+
+
+class TimelineEntry(models.Model):
+    """
+    Лента подписок, материализованная при публикации поста:
+    одна строка на пару (подписчик, пост).
+    """
+    user = models.ForeignKey(
+        User,
+        related_name='timeline',
+        on_delete=models.CASCADE,
+        db_index=False,
+        verbose_name='Подписчик'
+    )
+    post = models.ForeignKey(
+        Post,
+        related_name='timeline_entries',
+        on_delete=models.CASCADE,
+        verbose_name='Пост'
+    )
+    pub_date = models.DateTimeField('Дата публикации')
+
+    class Meta:
+        verbose_name = 'Запись ленты'
+        verbose_name_plural = 'Лента подписок'
+        ordering = ['-pub_date', '-post']
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'post'],
+                name='unique_timeline_entry'
+            )
+        ]
+        indexes = [
+            models.Index(
+                fields=['user', '-pub_date', '-post'],
+                name='timeline_user_pub_date_idx'
+            )
+        ]
+
+    def __str__(self):
+        return f'Timeline-{self.user_id}, Post-{self.post_id}'
+
+
+class AuthorStats(models.Model):
+    """
+    Счётчики пользователя. Обновляются сигналами через F(),
+    расхождения исправляет команда reconcile_counters.
+    """
+    user = models.OneToOneField(
+        User,
+        primary_key=True,
+        related_name='stats',
+        on_delete=models.CASCADE,
+        verbose_name='Пользователь'
+    )
+    posts_count = models.PositiveIntegerField('Постов', default=0)
+    published_posts_count = models.PositiveIntegerField(
+        'Опубликованных постов', default=0
+    )
+    followers_count = models.PositiveIntegerField('Подписчиков', default=0)
+    following_count = models.PositiveIntegerField('Подписок', default=0)
+
+    class Meta:
+        verbose_name = 'Счётчики пользователя'
+        verbose_name_plural = 'Счётчики пользователей'
+
+    def __str__(self):
+        return f'Stats-{self.user_id}'
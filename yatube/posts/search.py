@@ -0,0 +1,147 @@
+"""Полнотекстовый поиск по постам на SQLite FTS5."""
+import hashlib
+import re
+from collections import namedtuple
+
+from core.cache.generations import bump_generation, get_generation
+from core.cache.stampede import get_or_build
+from django.conf import settings
+from django.db import connection
+from django.db.models import Q
+from django.utils.html import escape
+from django.utils.safestring import mark_safe
+
+from .models import Post
+from .text import plain_text
+
+# Таблица создаётся миграцией 0023_post_fts: unicode61 приводит кириллицу
+# к нижнему регистру и снимает диакритику (ё -> е), префиксные индексы
+# ускоряют поиск по началу слова - "котик" находит "котики".
+FTS_TABLE = 'posts_post_fts'
+# Вес совпадений: имя автора важнее текста
+RANK_SQL = f'bm25({FTS_TABLE}, 1.0, 2.0, 1.0)'
+REBUILD_BATCH_SIZE = 500
+# Маркеры подсветки от FTS5: управляющие символы не встречаются в тексте,
+# поэтому фрагмент можно безопасно экранировать и потом заменить их на <mark>
+HIGHLIGHT_OPEN, HIGHLIGHT_CLOSE = '\x02', '\x03'
+SNIPPET_SQL = (
+    f"snippet({FTS_TABLE}, 0, '{HIGHLIGHT_OPEN}', '{HIGHLIGHT_CLOSE}', "
+    "'…', 24)"
+)
+
+SearchHit = namedtuple('SearchHit', ['post_id', 'snippet'])
+
+
+def fts_enabled():
+    return connection.vendor == 'sqlite'
+
+
+def build_match(query):
+    """Запрос пользователя -> выражение MATCH: все слова, по префиксу."""
+    words = re.findall(r'\w+', query.lower())
+    return ' '.join(f'"{word}"*' for word in words)
+
+
+def _documents(posts):
+    rows = posts.filter(is_published=True).values_list(
+        'id', 'text', 'author__username', 'group__title'
+    )
+    for pk, text, username, group_title in rows.iterator():
+        yield pk, plain_text(text), username, group_title or ''
+
+
+def unindex_posts(post_ids):
+    if not fts_enabled() or not post_ids:
+        return
+    with connection.cursor() as cursor:
+        cursor.executemany(
+            f'DELETE FROM {FTS_TABLE} WHERE rowid = %s',
+            [(pk,) for pk in post_ids]
+        )
+
+
+def index_posts(posts):
+    """(Пере)индексирует посты queryset; неодобренные из индекса уходят."""
+    if not fts_enabled():
+        return
+    post_ids = list(posts.values_list('id', flat=True))
+    unindex_posts(post_ids)
+    with connection.cursor() as cursor:
+        _insert(
+            cursor, list(_documents(Post.objects.filter(id__in=post_ids)))
+        )
+
+
+def rebuild_index():
+    """Полная переиндексация, возвращает число постов в индексе."""
+    if not fts_enabled():
+        return 0
+    indexed = 0
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {FTS_TABLE}')
+        batch = []
+        for document in _documents(Post.objects.all()):
+            batch.append(document)
+            if len(batch) == REBUILD_BATCH_SIZE:
+                indexed += _insert(cursor, batch)
+                batch = []
+        indexed += _insert(cursor, batch)
+    bump_generation('posts')
+    return indexed
+
+
+def _insert(cursor, documents):
+    cursor.executemany(
+        f'INSERT INTO {FTS_TABLE} (rowid, text, username, group_title) '
+        'VALUES (%s, %s, %s, %s)',
+        documents
+    )
+    return len(documents)
+
+
+def highlight(snippet):
+    """Фрагмент FTS5 -> безопасный HTML с <mark> вокруг совпадений."""
+    return mark_safe(
+        escape(snippet)
+        .replace(HIGHLIGHT_OPEN, '<mark>')
+        .replace(HIGHLIGHT_CLOSE, '</mark>')
+    )
+
+
+def _search(query, match, limit):
+    if not fts_enabled():
+        posts = Post.published.filter(
+            Q(text__icontains=query) | Q(author__username__icontains=query)
+        ).values_list('id', 'text')[:limit]
+        return [
+            SearchHit(pk, escape(plain_text(text)[:150]))
+            for pk, text in posts
+        ]
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'SELECT rowid, {SNIPPET_SQL} FROM {FTS_TABLE} '
+            f'WHERE {FTS_TABLE} MATCH %s ORDER BY {RANK_SQL} LIMIT %s',
+            [match, limit]
+        )
+        return [
+            SearchHit(pk, highlight(snippet))
+            for pk, snippet in cursor.fetchall()
+        ]
+
+
+def search_posts(query, limit):
+    """
+    Найденные опубликованные посты с подсвеченными фрагментами,
+    лучшие совпадения первыми. Результат запроса недолго лежит в кэше,
+    чтобы листание страниц не повторяло поиск; ключ содержит
+    поколение постов, так что правки видны сразу.
+    """
+    match = build_match(query or '')
+    if not match:
+        return []
+    digest = hashlib.md5(f'{match}:{limit}'.encode()).hexdigest()
+    key = f'search:{get_generation("posts")}:{digest}'
+    return get_or_build(
+        key, lambda: _search(query, match, limit),
+        settings.SEARCH_CACHE_TIMEOUT
+    )
@@ -0,0 +1,218 @@
+from core.cache.generations import bump_generation
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from .counters import bump_author_stats, bump_comments_count
+from .models import (AuthorStats, Comment, Follow, Group, Post, TimelineEntry,
+                     User)
+from .search import index_posts, unindex_posts
+from .thumbnails import pregenerate_thumbnails
+
+TIMELINE_BATCH_SIZE = 500
+
+
+@receiver(post_save, sender=Post)
+def fan_out_post(sender, instance, **kwargs):
+    """
+    Кладёт пост в ленты подписчиков автора, когда его опубликовали;
+    снятый с публикации пост из лент убирается.
+    """
+    was_published = bool(getattr(instance, '_was_published', None))
+    if was_published == instance.is_published:
+        return
+    if not instance.is_published:
+        TimelineEntry.objects.filter(post_id=instance.pk).delete()
+        return
+    followers = Follow.objects.filter(
+        author_id=instance.author_id
+    ).values_list('user_id', flat=True)
+    TimelineEntry.objects.bulk_create(
+        (
+            TimelineEntry(
+                user_id=user_id, post=instance, pub_date=instance.pub_date
+            )
+            for user_id in followers.iterator()
+        ),
+        batch_size=TIMELINE_BATCH_SIZE,
+        ignore_conflicts=True
+    )
+
+
+@receiver(post_save, sender=Follow)
+def backfill_timeline(sender, instance, created, **kwargs):
+    """Новая подписка: переносит в ленту уже написанные посты автора."""
+    if not created:
+        return
+    posts = Post.published.filter(
+        author_id=instance.author_id
+    ).values_list('id', 'pub_date')
+    TimelineEntry.objects.bulk_create(
+        (
+            TimelineEntry(
+                user_id=instance.user_id, post_id=post_id, pub_date=pub_date
+            )
+            for post_id, pub_date in posts.iterator()
+        ),
+        batch_size=TIMELINE_BATCH_SIZE,
+        ignore_conflicts=True
+    )
+
+
+@receiver(post_delete, sender=Follow)
+def prune_timeline(sender, instance, **kwargs):
+    """Отписка: убирает посты автора из ленты читателя."""
+    TimelineEntry.objects.filter(
+        user_id=instance.user_id,
+        post__author_id=instance.author_id
+    ).delete()
+
+
+@receiver(post_save, sender=Post)
+@receiver(post_delete, sender=Post)
+@receiver(post_save, sender=Group)
+@receiver(post_delete, sender=Group)
+@receiver(post_save, sender=Comment)
+@receiver(post_delete, sender=Comment)
+def invalidate_posts_generation(sender, **kwargs):
+    """Любая запись в посты, группы или комментарии сбрасывает кэш ленты."""
+    bump_generation('posts')
+
+
+@receiver(post_save, sender=Post)
+@receiver(post_delete, sender=Post)
+def invalidate_post_card(sender, instance, **kwargs):
+    bump_generation(f'post:{instance.pk}')
+
+
+@receiver(post_save, sender=Group)
+@receiver(post_delete, sender=Group)
+def invalidate_group_cards(sender, instance, **kwargs):
+    bump_generation(f'group:{instance.pk}')
+    bump_generation('groups')
+
+
+@receiver(post_save, sender=User)
+def invalidate_author_cards(sender, instance, update_fields=None, **kwargs):
+    """Вход на сайт обновляет только last_login - карточки не трогаем."""
+    if update_fields is not None and set(update_fields) == {'last_login'}:
+        return
+    bump_generation(f'user:{instance.pk}')
+    bump_generation('users')
+
+
+@receiver(post_save, sender=Follow)
+@receiver(post_delete, sender=Follow)
+def invalidate_profiles(sender, **kwargs):
+    """Счётчики подписчиков на закэшированных страницах профилей."""
+    bump_generation('follows')
+
+
+@receiver(post_save, sender=User)
+def create_author_stats(sender, instance, created, **kwargs):
+    if created:
+        AuthorStats.objects.get_or_create(user=instance)
+
+
+@receiver(pre_save, sender=Post)
+def remember_published_state(sender, instance, **kwargs):
+    """
+    Запоминает прежние is_published и картинку,
+    чтобы заметить одобрение поста и новую картинку.
+    """
+    previous = (
+        Post.objects.filter(pk=instance.pk)
+        .values_list('is_published', 'image')
+        .first()
+        if instance.pk else None
+    )
+    instance._was_published, instance._previous_image = previous or (
+        None, None
+    )
+
+
+@receiver(post_save, sender=Post)
+def count_saved_post(sender, instance, created, **kwargs):
+    published = int(instance.is_published)
+    if created:
+        bump_author_stats(
+            instance.author_id,
+            posts_count=1,
+            published_posts_count=published
+        )
+        return
+    was_published = getattr(instance, '_was_published', None)
+    if was_published is not None and bool(was_published) != bool(published):
+        bump_author_stats(
+            instance.author_id,
+            published_posts_count=1 if published else -1
+        )
+
+
+@receiver(post_delete, sender=Post)
+def count_deleted_post(sender, instance, **kwargs):
+    bump_author_stats(
+        instance.author_id,
+        posts_count=-1,
+        published_posts_count=-int(instance.is_published)
+    )
+
+
+@receiver(post_save, sender=Comment)
+def count_new_comment(sender, instance, created, **kwargs):
+    if created:
+        bump_comments_count(instance.post_id, 1)
+
+
+@receiver(post_delete, sender=Comment)
+def count_deleted_comment(sender, instance, **kwargs):
+    bump_comments_count(instance.post_id, -1)
+
+
+@receiver(post_save, sender=Follow)
+def count_new_follow(sender, instance, created, **kwargs):
+    if created:
+        bump_author_stats(instance.author_id, followers_count=1)
+        bump_author_stats(instance.user_id, following_count=1)
+
+
+@receiver(post_delete, sender=Follow)
+def count_deleted_follow(sender, instance, **kwargs):
+    bump_author_stats(instance.author_id, followers_count=-1)
+    bump_author_stats(instance.user_id, following_count=-1)
+
+
+@receiver(post_save, sender=Post)
+def index_saved_post(sender, instance, **kwargs):
+    index_posts(Post.objects.filter(pk=instance.pk))
+
+
+@receiver(post_delete, sender=Post)
+def unindex_deleted_post(sender, instance, **kwargs):
+    unindex_posts([instance.pk])
+
+
+@receiver(post_save, sender=Group)
+def reindex_group_posts(sender, instance, created, **kwargs):
+    if not created:
+        index_posts(instance.groups.all())
+
+
+@receiver(post_save, sender=User)
+def reindex_author_posts(sender, instance, created, update_fields=None,
+                         **kwargs):
+    """Имя автора есть в индексе; вход на сайт его не меняет."""
+    if created or (
+        update_fields is not None and 'username' not in update_fields
+    ):
+        return
+    index_posts(instance.posts.all())
+
+
+@receiver(post_save, sender=Post)
+def pregenerate_post_thumbnails(sender, instance, **kwargs):
+    """Новая картинка: миниатюры строятся в фоне после коммита."""
+    name = instance.image.name
+    if not name or name == getattr(instance, '_previous_image', None):
+        return
+    transaction.on_commit(lambda: pregenerate_thumbnails(name))
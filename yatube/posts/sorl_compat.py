@@ -0,0 +1,26 @@
+"""
+Закрытое API sorl-thumbnail, которым пользуется проект, - только здесь.
+Проверено на sorl-thumbnail 12.7.0 (requirements.txt): при обновлении
+сверить эти функции с исходниками sorl.
+"""
+from sorl.thumbnail import default
+
+
+def thumbnail_filename(source, geometry, options):
+    """Имя файла миниатюры, которое выберет sorl, без чтения исходника."""
+    return default.backend._get_thumbnail_filename(source, geometry, options)
+
+
+def create_thumbnail(source_image, geometry, options, thumbnail):
+    """Строит и сохраняет миниатюру из уже открытого исходника."""
+    default.backend._create_thumbnail(
+        source_image, geometry, options, thumbnail
+    )
+
+
+def encode_image(image, options):
+    """Байты картинки движка в формате и качестве из options."""
+    return default.engine._get_raw_data(
+        image, options['format'], options['quality'],
+        image_info={}, progressive=options.get('progressive', False)
+    )
@@ -0,0 +1,100 @@
+from core.cache.generations import get_many_with_generations
+from django import template
+from django.conf import settings
+from django.core.cache import cache
+from django.utils.safestring import mark_safe
+
+from .post_images import prefetch_thumbnail_urls
+
+register = template.Library()
+
+PREFETCH_CONTEXT_KEY = 'post_cards_prefetch'
+
+
+def card_key(post):
+    return f'post_card:{post.pk}'
+
+
+def card_generations(post):
+    """Поколения, от которых зависит карточка: пост, группа, автор."""
+    return (
+        f'post:{post.pk}',
+        f'group:{post.group_id}',
+        f'user:{post.author_id}',
+    )
+
+
+def card_version(post, generations):
+    return (post.group_id,) + tuple(
+        generations[name] for name in card_generations(post)
+    )
+
+
+def cached_card(post, cards, generations):
+    """HTML карточки из cards, если её версия совпала с поколениями."""
+    cached = cards.get(card_key(post))
+    if cached is not None and cached[0] == card_version(post, generations):
+        return cached[1]
+    return None
+
+
+@register.simple_tag(takes_context=True)
+def prefetch_post_cards(context, posts, thumbnails=None):
+    """
+    Достаёт карточки страницы и их поколения одним get_many,
+    дальше post_card берёт их из контекста. thumbnails - размер
+    картинок карточки: их адреса достаются только для карточек,
+    которых нет в кэше, - готовым карточкам они не нужны.
+    """
+    posts = list(posts)
+    names = {name for post in posts for name in card_generations(post)}
+    cards, generations = context[PREFETCH_CONTEXT_KEY] = (
+        get_many_with_generations([card_key(post) for post in posts], names)
+    )
+    if thumbnails:
+        prefetch_thumbnail_urls(context, [
+            post for post in posts
+            if cached_card(post, cards, generations) is None
+        ], thumbnails)
+    return ''
+
+
+class PostCardNode(template.Node):
+
+    def __init__(self, nodelist, post):
+        self.nodelist = nodelist
+        self.post = post
+
+    def render(self, context):
+        post = self.post.resolve(context)
+        key = card_key(post)
+        cards, generations = context.get(PREFETCH_CONTEXT_KEY) or ({}, {})
+        if not all(name in generations for name in card_generations(post)):
+            cards, generations = get_many_with_generations(
+                [key], card_generations(post)
+            )
+        cached = cached_card(post, cards, generations)
+        if cached is not None:
+            return mark_safe(cached)
+        html = self.nodelist.render(context)
+        cache.set(
+            key, (card_version(post, generations), html),
+            settings.POST_CARD_CACHE_TIMEOUT
+        )
+        return html
+
+
+@register.tag
+def post_card(parser, token):
+    """
+    {% post_card post %}...{% endpost_card %} - фрагмент карточки поста,
+    закэшированный по id и поколениям поста, группы и автора.
+    """
+    bits = token.split_contents()
+    if len(bits) != 2:
+        raise template.TemplateSyntaxError(
+            f"'{bits[0]}' tag requires exactly one argument: post"
+        )
+    nodelist = parser.parse(('endpost_card',))
+    parser.delete_first_token()
+    return PostCardNode(nodelist, parser.compile_filter(bits[1]))
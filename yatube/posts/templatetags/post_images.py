@@ -0,0 +1,59 @@
+from django import template
+from posts.thumbnails import (IMAGE_SPECS, display_size, spec_variants,
+                              thumbnail_urls)
+
+register = template.Library()
+
+PREFETCH_CONTEXT_KEY = 'thumbnail_urls_prefetch'
+
+
+def prefetch_thumbnail_urls(context, posts, spec):
+    """
+    Адреса всех вариантов миниатюр posts одним пакетным запросом,
+    дальше post_picture берёт их из контекста.
+    """
+    names = [post.image.name for post in posts if post.image]
+    if not names:
+        return
+    variants = [variant for variant, *_ in spec_variants(spec)]
+    prefetched = context.get(PREFETCH_CONTEXT_KEY, {})
+    prefetched.update(thumbnail_urls(names, variants))
+    context[PREFETCH_CONTEXT_KEY] = prefetched
+
+
+@register.inclusion_tag('includes/picture.html', takes_context=True)
+def post_picture(context, post, spec, css_class=''):
+    """
+    {% post_picture post 'card' 'card-img' %} - <picture> со srcset
+    всех ширин и форматов размера spec. Картинку не открывает:
+    размеры и заглушка берутся из полей поста.
+    """
+    image = post.image
+    if not image:
+        return {'sources': None}
+    variants = spec_variants(spec, post.image_width, post.image_height)
+    urls = context.get(PREFETCH_CONTEXT_KEY, {})
+    if any((image.name, variant) not in urls for variant, *_ in variants):
+        urls = thumbnail_urls(
+            [image.name], [variant for variant, *_ in variants]
+        )
+    srcsets = {}
+    for variant, width, _, mime_type in variants:
+        srcsets.setdefault(mime_type, []).append(
+            f'{urls[image.name, variant]} {width}w'
+        )
+    sources = [
+        {'type': mime_type, 'srcset': ', '.join(srcset)}
+        for mime_type, srcset in srcsets.items()
+    ]
+    fallback = sources.pop()
+    return {
+        'sources': sources,
+        'fallback': fallback,
+        'src': urls[image.name, variants[-1][0]],
+        'sizes': IMAGE_SPECS[spec]['sizes'],
+        'css_class': css_class,
+        'size': display_size(spec, post.image_width, post.image_height),
+        'placeholder': post.image_placeholder,
+        'color': post.image_color,
+    }
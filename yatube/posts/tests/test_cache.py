@@ -0,0 +1,276 @@
+import multiprocessing
+import os
+import shutil
+import tempfile
+from unittest import mock
+
+from core.cache.backends.memory import MemoryCache
+from core.cache.backends.sqlite import SQLiteCache
+from core.cache.backends.tiered import TieredCache
+from core.cache.generations import bump_generation, get_generation
+from core.cache.stampede import get_or_build, store
+from debug_toolbar.panels.cache import CacheStatTracker
+from django.contrib.auth import get_user_model
+from django.core.cache import cache, caches
+from django.test import Client, SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+
+User = get_user_model()
+
+
+def _increment(location, times):
+    cache = SQLiteCache(location, {})
+    for _ in range(times):
+        cache.incr('counter')
+
+
+class SQLiteCacheTest(SimpleTestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.location = os.path.join(self.directory, 'cache.sqlite3')
+        self.cache = SQLiteCache(self.location, {
+            'OPTIONS': {'MAX_BYTES': 4096, 'TOUCH_INTERVAL': 0},
+        })
+
+    def tearDown(self):
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def test_values_are_shared_between_instances(self):
+        """Тест: второй экземпляр видит записи первого - файл общий."""
+        self.cache.set_many({'a': 1, 'b': [2]})
+        other = SQLiteCache(self.location, {})
+        self.assertEqual(other.get_many(['a', 'b', 'c']), {'a': 1, 'b': [2]})
+        other.delete('a')
+        self.assertIsNone(self.cache.get('a'))
+
+    def test_add_and_expiry(self):
+        """Тест: add не перезаписывает живую запись, истёкшая не видна."""
+        self.assertTrue(self.cache.add('key', 'first'))
+        self.assertFalse(self.cache.add('key', 'second'))
+        self.assertEqual(self.cache.get('key'), 'first')
+        self.cache.set('key', 'value', timeout=0)
+        self.assertIsNone(self.cache.get('key'))
+        self.assertTrue(self.cache.add('key', 'again'))
+
+    def test_delete_if_checks_value(self):
+        """Тест: delete_if удаляет запись, только если значение совпало."""
+        self.cache.set('lock', 'mine')
+        self.assertFalse(self.cache.delete_if('lock', 'theirs'))
+        self.assertEqual(self.cache.get('lock'), 'mine')
+        self.assertTrue(self.cache.delete_if('lock', 'mine'))
+        self.assertNotIn('lock', self.cache)
+
+    def test_incr_is_atomic_across_processes(self):
+        """Тест: incr из нескольких процессов не теряет приращений."""
+        self.cache.set('counter', 0)
+        with self.assertRaises(ValueError):
+            self.cache.incr('missing')
+        context = multiprocessing.get_context('fork')
+        workers = [
+            context.Process(target=_increment, args=(self.location, 50))
+            for _ in range(3)
+        ]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        self.assertEqual(self.cache.get('counter'), 150)
+
+    def test_least_recently_used_are_evicted_over_budget(self):
+        """Тест: сверх MAX_BYTES вытесняются давно не читанные записи."""
+        self.cache.set('kept', 'x' * 1000)
+        self.cache.set('old', 'x' * 1000)
+        self.cache.get('kept')
+        self.cache.set('new', 'x' * 1000)
+        self.cache.set('newest', 'x' * 1000)
+        self.cache.get('kept')
+        self.cache.set('overflow', 'x' * 1000)
+        self.assertIn('kept', self.cache)
+        self.assertNotIn('old', self.cache)
+        self.assertIn('overflow', self.cache)
+
+
+class MemoryCacheTest(SimpleTestCase):
+    def setUp(self):
+        self.cache = MemoryCache(self.id(), {
+            'OPTIONS': {'MAX_BYTES': 4096},
+        })
+        self.addCleanup(self.cache.clear)
+
+    def test_least_recently_used_are_evicted_by_bytes(self):
+        """Тест: вытесняется ровно столько давних записей, сколько нужно."""
+        for name in ('kept', 'old', 'new'):
+            self.cache.set(f'post_card:{name}', 'x' * 1000)
+        self.cache.get('post_card:kept')
+        self.cache.set('post_card:overflow', 'x' * 1000)
+        self.assertEqual(
+            set(self.cache.get_many([
+                'post_card:kept', 'post_card:old', 'post_card:new',
+                'post_card:overflow',
+            ])),
+            {'post_card:kept', 'post_card:new', 'post_card:overflow'}
+        )
+        stats = self.cache.stats()
+        self.assertLessEqual(stats['bytes'], stats['max_bytes'])
+        self.assertEqual(stats['prefixes']['post_card']['evictions'], 1)
+
+    def test_counters_by_prefix(self):
+        """Тест: попадания, промахи и истечения считаются по префиксам."""
+        self.cache.set('search:1', 'hits')
+        self.cache.set('generation:posts', 1, timeout=0)
+        self.cache.get('search:1')
+        self.cache.get('search:2')
+        self.assertIsNone(self.cache.get('generation:posts'))
+        self.assertTrue(self.cache.add('generation:posts', 1, None))
+        self.assertEqual(self.cache.incr('generation:posts'), 2)
+        prefixes = self.cache.stats()['prefixes']
+        self.assertEqual(prefixes['search']['hits'], 1)
+        self.assertEqual(prefixes['search']['misses'], 1)
+        self.assertEqual(prefixes['generation']['expirations'], 1)
+        self.assertEqual(prefixes['generation']['hits'], 1)
+
+
+class TrackedSQLiteCache(CacheStatTracker):
+    """L2 так, как его видит debug_toolbar: set_many возвращает None."""
+
+    def __init__(self, location, params):
+        super().__init__(SQLiteCache(location, params))
+
+
+class TrackedTieredCache(CacheStatTracker):
+    def __init__(self, location, params):
+        super().__init__(TieredCache(location, params))
+
+
+def tiered_caches(directory, tracked=False):
+    """
+    Два процесса: у каждого свой L1, L2 и канал версий общие.
+    tracked - кэши обёрнуты так же, как их оборачивает debug_toolbar.
+    """
+    options = {'L2': 'shared', 'CHANNEL': os.path.join(directory, 'version')}
+    module = 'posts.tests.test_cache.Tracked'
+    return {
+        'default': {
+            'BACKEND': (
+                f'{module}TieredCache' if tracked
+                else 'core.cache.backends.tiered.TieredCache'
+            ),
+            'OPTIONS': {'L1': 'first', **options},
+        },
+        'other': {
+            'BACKEND': 'core.cache.backends.tiered.TieredCache',
+            'OPTIONS': {'L1': 'second', **options},
+        },
+        'shared': {
+            'BACKEND': (
+                f'{module}SQLiteCache' if tracked
+                else 'core.cache.backends.sqlite.SQLiteCache'
+            ),
+            'LOCATION': os.path.join(directory, 'cache.sqlite3'),
+        },
+        'first': {
+            'BACKEND': 'core.cache.backends.memory.MemoryCache',
+            'LOCATION': f'{directory}/first',
+        },
+        'second': {
+            'BACKEND': 'core.cache.backends.memory.MemoryCache',
+            'LOCATION': f'{directory}/second',
+        },
+    }
+
+
+class TieredCacheTest(SimpleTestCase):
+    tracked = False
+
+    def setUp(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory, ignore_errors=True)
+        settings_override = override_settings(
+            CACHES=tiered_caches(directory, self.tracked)
+        )
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+    def test_reads_are_served_from_l1(self):
+        """Тест: прочитанное значение берётся из L1, без похода в L2."""
+        caches['default'].set('search:1', 'hits')
+        self.assertEqual(caches['other'].get('search:1'), 'hits')
+        caches['shared'].delete('search:1')
+        self.assertEqual(caches['other'].get('search:1'), 'hits')
+
+    def test_generation_bump_drops_l1_of_other_processes(self):
+        """Тест: новое поколение видно другому процессу сразу."""
+        before = get_generation('posts')
+        self.assertEqual(caches['other'].get('generation:posts'), before)
+        bump_generation('posts')
+        self.assertEqual(caches['other'].get('generation:posts'), before + 1)
+        caches['default'].delete('generation:posts')
+        self.assertIsNone(caches['other'].get('generation:posts'))
+
+
+class TrackedTieredCacheTest(TieredCacheTest):
+    """Те же тесты под обёртками debug_toolbar (DEBUG в разработке)."""
+    tracked = True
+
+    def test_set_many_when_l2_returns_none(self):
+        """Тест: set_many работает, когда L2 вернул None вместо списка."""
+        self.assertIsNone(caches['shared'].set_many({'x': 1}))
+        caches['default'].set_many({'a': 1, 'b': 2})
+        self.assertEqual(
+            caches['other'].get_many(['a', 'b']), {'a': 1, 'b': 2}
+        )
+
+    def test_rebuild_lock_released_through_wrapper(self):
+        """Тест: delete_if доходит до кэша и через обёртку."""
+        build = mock.Mock(return_value='new')
+        self.assertEqual(get_or_build('page', build, 10), 'new')
+        self.assertNotIn('rebuild:page', caches['shared'])
+
+
+class StampedeTest(SimpleTestCase):
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+        self.build = mock.Mock(return_value='new')
+
+    def test_stale_copy_is_served_while_another_rebuilds(self):
+        """Тест: пока блокировку держит другой, отдаётся устаревшее."""
+        store('page', 'old', 0, 0)
+        cache.add('rebuild:page', 'other worker', 10)
+        self.assertEqual(get_or_build('page', self.build, 10), 'old')
+        self.build.assert_not_called()
+        self.assertFalse(cache.delete_if('rebuild:page', 'this worker'))
+        self.assertTrue(cache.delete_if('rebuild:page', 'other worker'))
+        self.assertEqual(get_or_build('page', self.build, 10), 'new')
+        self.assertEqual(get_or_build('page', self.build, 10), 'new')
+        self.build.assert_called_once()
+
+    @mock.patch('core.cache.stampede.random.random', return_value=0.5)
+    def test_early_recompute_depends_on_rebuild_time(self, random):
+        """Тест: долгая перестройка начинается раньше срока, с beta=0 нет."""
+        store('page', 'old', 10, 60)
+        self.assertEqual(get_or_build('page', self.build, 10, beta=0), 'old')
+        self.assertEqual(get_or_build('page', self.build, 10), 'new')
+
+    @override_settings(CACHE_REBUILD_LOCK_TIMEOUT=0.1)
+    def test_miss_waits_for_the_lock_holder_then_builds(self):
+        """Тест: при промахе ждут чужую перестройку, но не бесконечно."""
+        cache.add('rebuild:page', 'stuck worker', 10)
+        self.assertEqual(get_or_build('page', self.build, 10), 'new')
+        self.build.assert_called_once()
+
+
+class CacheStatsViewTest(TestCase):
+    def test_stats_are_for_staff_only(self):
+        """Тест: метрики кэшей видит только персонал."""
+        url = reverse('cache_stats')
+        client = Client()
+        client.force_login(User.objects.create_user('reader'))
+        self.assertEqual(client.get(url).status_code, 302)
+        client.force_login(
+            User.objects.create_user('admin', is_staff=True)
+        )
+        response = client.get(url)
+        self.assertIn('prefixes', response.json()['local'])
+        self.assertIn('entries', response.json()['shared'])
+        self.assertIn('hits', response.json()['thumbnail_kvstore'])
@@ -2,8 +2,10 @@ import shutil
 import tempfile
 from http import HTTPStatus
 
+from core.storage import hashed_name
 from django.conf import settings
 from django.contrib.auth import get_user_model
+from django.core.files.base import ContentFile
 from django.core.files.uploadedfile import SimpleUploadedFile
 from django.test import Client, TestCase, override_settings
 from django.urls import reverse
@@ -33,6 +35,10 @@ class PostCreateFormTests(TestCase):
             content=cls.small_gif,
             content_type='image/gif'
         )
+        # Картинки хранятся под хэшем содержимого.
+        cls.image_name = hashed_name(
+            'posts/small.gif', ContentFile(cls.small_gif)
+        )
         cls.user = User.objects.create_user(username='NameTest')
         cls.group = Group.objects.create(
             title='Тестовая группа',
@@ -68,10 +74,7 @@ class PostCreateFormTests(TestCase):
         self.assertEqual(post_last.author, self.user)
         self.assertEqual(post_last.group_id, form_data['group'])
         self.assertEqual(response.status_code, HTTPStatus.OK)
-        if 'Отредактированный текст' in form_data.values():
-            self.assertEqual(post_last.image, 'posts/small1.gif')
-        else:
-            self.assertEqual(post_last.image, 'posts/small.gif')
+        self.assertEqual(post_last.image, self.image_name)
 
     def test_create_post_form_valid_by_authorized_user(self):
         """
@@ -94,7 +97,7 @@ class PostCreateFormTests(TestCase):
             Post.objects.filter(
                 text=form_data['text'],
                 group=form_data['group'],
-                image='posts/small.gif'
+                image=self.image_name
             ).exists()
         )
         redirect = reverse(
@@ -0,0 +1,167 @@
+import os
+import shutil
+import tempfile
+from io import BytesIO, StringIO
+
+from core.storage import is_hashed_name
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from PIL import Image
+
+from ..forms import PostForm
+from ..images import EXIF_ORIENTATION, prepare_post_image
+from ..models import Post
+from ..thumbnails import generate_thumbnails
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+User = get_user_model()
+
+SMALL_GIF = (
+    b'\x47\x49\x46\x38\x39\x61\x02\x00'
+    b'\x01\x00\x80\x00\x00\x00\x00\x00'
+    b'\xFF\xFF\xFF\x21\xF9\x04\x00\x00'
+    b'\x00\x00\x00\x2C\x00\x00\x00\x00'
+    b'\x02\x00\x01\x00\x00\x02\x02\x0C'
+    b'\x0A\x00\x3B'
+)
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class ContentAddressedStorageTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='NameTest')
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def create_post(self, filename):
+        post = Post(author=self.user, text='Пост с картинкой')
+        post.image.save(filename, ContentFile(SMALL_GIF))
+        return post
+
+    def test_same_content_stored_once(self):
+        """Тест: одинаковые загрузки ложатся в один файл под хэшем."""
+        first = self.create_post('love.gif')
+        second = self.create_post('love_copy.GIF')
+        self.assertEqual(first.image.name, second.image.name)
+        self.assertTrue(is_hashed_name(first.image.name))
+        directory = os.path.dirname(first.image.path)
+        self.assertEqual(os.listdir(directory), [
+            os.path.basename(first.image.name)
+        ])
+
+    def test_image_metadata_stored_on_save(self):
+        """Тест: размеры, цвет и заглушка считаются при сохранении."""
+        post = self.create_post('dot.gif')
+        post.refresh_from_db()
+        self.assertEqual((post.image_width, post.image_height), (2, 1))
+        self.assertRegex(post.image_color, r'^#[0-9a-f]{6}$')
+        self.assertTrue(
+            post.image_placeholder.startswith('data:image/webp;base64,')
+        )
+        post.image = None
+        post.save()
+        self.assertIsNone(post.image_width)
+        self.assertEqual(post.image_placeholder, '')
+
+    def test_dedupe_command_merges_old_copies(self):
+        """Тест: команда сливает копии старых загрузок в один файл."""
+        names = [
+            default_storage.save('posts/love.gif', ContentFile(SMALL_GIF))
+            for _ in range(3)
+        ]
+        self.assertEqual(len(set(names)), 3)
+        posts = [
+            Post.objects.create(author=self.user, text='Пост', image=name)
+            for name in names
+        ]
+        out = StringIO()
+        call_command('dedupe_post_images', '--dry-run', stdout=out)
+        self.assertIn('файлов - 3, уникальных - 1', out.getvalue())
+        self.assertIn(
+            f'освобождено байт - {2 * len(SMALL_GIF)}', out.getvalue()
+        )
+        self.assertTrue(all(default_storage.exists(name) for name in names))
+        call_command('dedupe_post_images', stdout=StringIO())
+        images = {
+            Post.objects.get(pk=post.pk).image.name for post in posts
+        }
+        self.assertEqual(len(images), 1)
+        self.assertTrue(default_storage.exists(images.pop()))
+        self.assertFalse(any(default_storage.exists(name) for name in names))
+
+    def test_collect_media_garbage_removes_only_orphans(self):
+        """Тест: сборщик удаляет файлы без постов, живые не трогает."""
+        media_root = tempfile.mkdtemp(dir=TEMP_MEDIA_ROOT)
+        with self.settings(MEDIA_ROOT=media_root):
+            self.check_collect_media_garbage()
+
+    def check_collect_media_garbage(self):
+        post = self.create_post('live.gif')
+        live_thumbnails = generate_thumbnails(post.image.name)
+        orphan = default_storage.save(
+            'posts/orphan.gif', ContentFile(SMALL_GIF + b'orphan')
+        )
+        orphan_thumbnails = generate_thumbnails(orphan)
+        out = StringIO()
+        call_command(
+            'collect_media_garbage', '--dry-run', '--min-age=0', stdout=out
+        )
+        self.assertIn(
+            f'файлов - {len(orphan_thumbnails) + 1}', out.getvalue()
+        )
+        self.assertTrue(default_storage.exists(orphan))
+        call_command('collect_media_garbage', '--min-age=0', stdout=out)
+        self.assertFalse(default_storage.exists(orphan))
+        for name in orphan_thumbnails:
+            self.assertFalse(default_storage.exists(name))
+        self.assertTrue(default_storage.exists(post.image.name))
+        for name in live_thumbnails:
+            self.assertTrue(default_storage.exists(name))
+
+
+def jpeg_upload(size, orientation=None):
+    image = Image.new('RGB', size, (200, 30, 30))
+    exif = Image.Exif()
+    if orientation is not None:
+        exif[EXIF_ORIENTATION] = orientation
+    buffer = BytesIO()
+    image.save(buffer, 'JPEG', exif=exif.tobytes())
+    return SimpleUploadedFile(
+        'photo.jpg', buffer.getvalue(), content_type='image/jpeg'
+    )
+
+
+@override_settings(
+    POST_IMAGE_MAX_SIZE=(400, 400), POST_IMAGE_MAX_PIXELS=4 * 10 ** 6
+)
+class PostImageUploadTest(TestCase):
+    def test_large_photo_downscaled_and_rotated(self):
+        """Тест: большое фото уменьшается и разворачивается по EXIF."""
+        upload = prepare_post_image(jpeg_upload((1600, 1200), orientation=6))
+        image = Image.open(upload)
+        self.assertEqual(image.size, (300, 400))
+        self.assertEqual(image.getexif().get(EXIF_ORIENTATION, 1), 1)
+
+    def test_small_image_kept_as_is(self):
+        """Тест: картинку в пределах размера не пересохраняем."""
+        upload = jpeg_upload((300, 200))
+        self.assertIs(prepare_post_image(upload), upload)
+
+    def test_decompression_bomb_rejected(self):
+        """Тест: слишком много пикселей - ошибка формы."""
+        form = PostForm(
+            data={'text': 'Пост с огромной картинкой'},
+            files={'image': jpeg_upload((2500, 2000))},
+        )
+        self.assertFalse(form.is_valid())
+        self.assertIn('image', form.errors)
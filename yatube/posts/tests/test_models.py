@@ -1,7 +1,7 @@
 from django.contrib.auth import get_user_model
 from django.test import TestCase
 
-from ..models import Group, Post
+from ..models import Comment, Group, Post
 
 User = get_user_model()
 
@@ -57,3 +57,28 @@ class PostModelTest(TestCase):
             with self.subTest(field=field):
                 self.assertEqual(
                     self.post._meta.get_field(field).help_text, expected_value)
+
+    def test_post_save_renders_text_once(self):
+        """При сохранении пост получает очищенный HTML и начало текста."""
+        post = Post.objects.create(
+            author=self.user,
+            text=(
+                '<p onclick="steal()">Привет, <b>мир</b>!'
+                '<script>alert(1)</script></p>'
+                '<p><a href="javascript:alert(1)">ссылка</a></p>'
+            ),
+        )
+        self.assertEqual(
+            post.text_html,
+            '<p>Привет, <b>мир</b>!</p><p><a>ссылка</a></p>'
+        )
+        self.assertEqual(post.excerpt, 'Привет, мир! ссылка')
+
+    def test_comment_save_sanitizes_text(self):
+        """Комментарий хранит HTML без опасных тегов."""
+        comment = Comment.objects.create(
+            post=self.post,
+            author=self.user,
+            text='<p>Хорошо<img src="x" onerror="steal()"></p>',
+        )
+        self.assertEqual(comment.text_html, '<p>Хорошо<img src="x"></p>')
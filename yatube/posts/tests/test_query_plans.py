@@ -0,0 +1,96 @@
+from unittest import skipUnless
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from ..models import Comment, Follow, Group, Post
+
+User = get_user_model()
+
+NUMBER_POSTS = 15
+
+# Таблицы, по которым ленты обязаны ходить только через индексы
+WATCHED_TABLES = (
+    'posts_post',
+    'posts_follow',
+    'posts_comment',
+    'posts_timelineentry',
+)
+
+
+def full_scans(sql):
+    """Строки EXPLAIN QUERY PLAN с полным обходом таблицы из WATCHED."""
+    with connection.cursor() as cursor:
+        cursor.execute(f'EXPLAIN QUERY PLAN {sql}')
+        plan = [row[-1] for row in cursor.fetchall()]
+    return [
+        detail for detail in plan
+        if detail.startswith('SCAN')
+        and 'USING' not in detail
+        and any(table in detail.split() for table in WATCHED_TABLES)
+    ]
+
+
+@skipUnless(connection.vendor == 'sqlite', 'EXPLAIN QUERY PLAN из SQLite')
+class FeedQueryPlanTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(username='Author')
+        cls.reader = User.objects.create_user(username='Reader')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test-slug',
+            description='Тестовое описание',
+        )
+        Follow.objects.create(user=cls.reader, author=cls.author)
+        for n in range(NUMBER_POSTS):
+            cls.post = Post.objects.create(
+                author=cls.author,
+                text=f'Тестовый пост {n}',
+                group=cls.group,
+                is_published=True
+            )
+        Comment.objects.create(
+            post=cls.post, author=cls.reader, text='Комментарий'
+        )
+
+    def setUp(self):
+        self.client = Client()
+        self.client.force_login(self.reader)
+        cache.clear()
+
+    def tearDown(self):
+        cache.clear()
+
+    def feed_urls(self):
+        urls = [
+            reverse('posts:index'),
+            reverse('posts:group_list', kwargs={'slug': self.group.slug}),
+            reverse('posts:profile', kwargs={'username': self.author}),
+            reverse('posts:follow_index'),
+            reverse('posts:post_detail', kwargs={'post_id': self.post.pk}),
+        ]
+        # Вторые страницы: курсорная выборка по (pub_date, id)
+        for url in urls[:4]:
+            page = self.client.get(url).context['page_obj']
+            urls.append(f'{url}?after={page.next_cursor()}')
+        cache.clear()
+        return urls
+
+    def test_feed_queries_use_indexes(self):
+        """Ни один запрос лент не делает полный обход таблицы."""
+        for url in self.feed_urls():
+            with self.subTest(url=url):
+                with CaptureQueriesContext(connection) as queries:
+                    response = self.client.get(url)
+                self.assertEqual(response.status_code, 200)
+                for query in queries.captured_queries:
+                    if not query['sql'].startswith('SELECT'):
+                        continue
+                    self.assertEqual(
+                        full_scans(query['sql']), [], query['sql']
+                    )
@@ -0,0 +1,125 @@
+from io import StringIO
+from unittest import skipUnless
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from ..models import Group, Post
+from ..search import FTS_TABLE, fts_enabled
+
+User = get_user_model()
+
+PAGE_SIZE = 10
+
+
+@skipUnless(fts_enabled(), 'FTS5 есть только в SQLite')
+class SearchTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='Пушкин')
+        cls.group = Group.objects.create(
+            title='Поэзия',
+            slug='poetry',
+            description='Стихи',
+        )
+        cls.post = Post.objects.create(
+            author=cls.user,
+            text='<p><strong>Котики</strong> гуляют по крышам</p>',
+            group=cls.group,
+            is_published=True
+        )
+        cls.draft = Post.objects.create(
+            author=cls.user,
+            text='<p>Котики в черновике</p>',
+            is_published=False
+        )
+
+    def setUp(self):
+        self.guest_client = Client()
+        cache.clear()
+
+    def found(self, query):
+        """id постов, которые показала страница поиска."""
+        response = self.guest_client.get(
+            reverse('posts:search_results'), {'q': query}
+        )
+        return [post.pk for post in response.context['page_obj']]
+
+    def test_search_by_word_prefix_author_and_group(self):
+        """Поиск по началу слова, имени автора и названию группы."""
+        for query in ('котик', 'КРЫШ', 'пушкин', 'поэзия'):
+            with self.subTest(query=query):
+                self.assertEqual(self.found(query), [self.post.pk])
+
+    def test_html_markup_is_not_indexed(self):
+        """Теги CKEditor не попадают в индекс."""
+        self.assertEqual(self.found('strong'), [])
+
+    def test_index_follows_post_changes(self):
+        """Одобрение, правка и удаление поста сразу видны в поиске."""
+        self.draft.is_published = True
+        self.draft.save()
+        self.assertEqual(
+            set(self.found('котики')),
+            {self.post.pk, self.draft.pk}
+        )
+        self.post.text = '<p>Собаки</p>'
+        self.post.save()
+        self.assertEqual(self.found('котики'), [self.draft.pk])
+        self.draft.delete()
+        self.assertEqual(self.found('котики'), [])
+
+    def test_search_view_without_query(self):
+        """Страница поиска без q отвечает пустым списком, а не ошибкой."""
+        response = self.guest_client.get(reverse('posts:search_results'))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(list(response.context['page_obj']), [])
+
+    def test_search_view_finds_published_posts(self):
+        """Страница поиска показывает только опубликованные посты."""
+        response = self.guest_client.get(
+            reverse('posts:search_results'), {'q': 'котики'}
+        )
+        self.assertEqual(list(response.context['page_obj']), [self.post])
+
+    def test_search_view_highlights_snippet(self):
+        """Фрагмент с подсветкой строит FTS5, разметка поста экранирована."""
+        response = self.guest_client.get(
+            reverse('posts:search_results'), {'q': 'крыш'}
+        )
+        self.assertContains(
+            response, 'Котики гуляют по <mark>крышам</mark>', html=False
+        )
+        self.assertNotContains(response, '<strong>')
+
+    def test_search_results_paginated_by_cursor(self):
+        """Результаты листаются курсором, без повторов."""
+        Post.objects.bulk_create([
+            Post(author=self.user, text=f'Кошки {n}', is_published=True)
+            for n in range(PAGE_SIZE + 2)
+        ])
+        call_command('rebuild_search_index', stdout=StringIO())
+        url = reverse('posts:search_results')
+        first = self.guest_client.get(url, {'q': 'кошки'})
+        page_obj = first.context['page_obj']
+        self.assertEqual(len(page_obj), PAGE_SIZE)
+        self.assertContains(first, 'after=')
+        second = self.guest_client.get(
+            url, {'q': 'кошки', 'after': page_obj.next_cursor()}
+        ).context['page_obj']
+        self.assertEqual(len(second), 2)
+        self.assertFalse(set(page_obj) & set(second))
+
+    def test_rebuild_search_index(self):
+        """Команда rebuild_search_index заполняет пустой индекс."""
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {FTS_TABLE}')
+        self.assertEqual(self.found('котики'), [])
+        out = StringIO()
+        call_command('rebuild_search_index', stdout=out)
+        self.assertIn('Проиндексировано постов: 1', out.getvalue())
+        self.assertEqual(self.found('котики'), [self.post.pk])
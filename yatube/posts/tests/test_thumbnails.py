@@ -0,0 +1,125 @@
+import shutil
+import tempfile
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.template import Context, Template
+from django.test import SimpleTestCase, TestCase, override_settings
+
+from ..kvstore import KVStore
+from ..models import Post
+from ..thumbnails import (generate_thumbnails, spec_thumbnail_file,
+                          spec_variants, thumbnail_url, thumbnail_urls)
+
+CARD = 'card-700-jpeg'
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+SMALL_GIF = (
+    b'\x47\x49\x46\x38\x39\x61\x02\x00'
+    b'\x01\x00\x80\x00\x00\x00\x00\x00'
+    b'\xFF\xFF\xFF\x21\xF9\x04\x00\x00'
+    b'\x00\x00\x00\x2C\x00\x00\x00\x00'
+    b'\x02\x00\x01\x00\x00\x02\x02\x0C'
+    b'\x0A\x00\x3B'
+)
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class ThumbnailKVStoreTest(TestCase):
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        cache.clear()
+        self.names = [
+            default_storage.save(f'posts/{name}.gif', ContentFile(SMALL_GIF))
+            for name in ('first', 'second', 'third')
+        ]
+        for name in self.names[:2]:
+            generate_thumbnails(name)
+        cache.clear()
+
+    def test_spec_file_matches_generated_thumbnail(self):
+        """Тест: имя миниатюры считается без картинки и совпадает с sorl."""
+        name = self.names[0]
+        self.assertIn(
+            spec_thumbnail_file(name, CARD).name, generate_thumbnails(name)
+        )
+
+    def test_get_many_is_one_query_then_lru(self):
+        """Тест: промахи LRU ищутся одним запросом, повтор - из памяти."""
+        store = KVStore()
+        files = [spec_thumbnail_file(name, CARD) for name in self.names]
+        with self.assertNumQueries(1):
+            known = store.get_many(files)
+        self.assertEqual(set(known), {image.key for image in files[:2]})
+        cache.clear()
+        with self.assertNumQueries(0):
+            store.get_many(files[:2])
+        stats = store.lru.stats()
+        self.assertEqual(stats['hits'], 2)
+        self.assertEqual(stats['misses'], 3)
+        self.assertEqual(stats['size'], 2)
+
+    def test_lru_is_bounded(self):
+        """Тест: LRU вытесняет самые давние записи."""
+        with self.settings(THUMBNAIL_KVSTORE_LRU_SIZE=1):
+            store = KVStore()
+        store.get_many(
+            [spec_thumbnail_file(name, CARD) for name in self.names]
+        )
+        self.assertEqual(len(store.lru), 1)
+
+    def test_thumbnail_urls_direct_for_ready_lazy_for_missing(self):
+        """Тест: готовые миниатюры - прямые адреса, остальные - ленивые."""
+        urls = thumbnail_urls(self.names, [CARD])
+        for name in self.names[:2]:
+            self.assertEqual(
+                urls[name, CARD], spec_thumbnail_file(name, CARD).url
+            )
+        self.assertEqual(
+            urls[self.names[2], CARD], thumbnail_url(self.names[2], CARD)
+        )
+
+    @mock.patch(
+        'posts.templatetags.post_images.thumbnail_urls', return_value={}
+    )
+    def test_thumbnails_prefetched_only_for_card_misses(self, urls):
+        """Тест: адреса миниатюр достаются только для новых карточек."""
+        post = Post.objects.create(
+            author=get_user_model().objects.create_user('author'),
+            text='Пост', image=self.names[0]
+        )
+        template = Template(
+            "{% load post_cards %}"
+            "{% prefetch_post_cards posts thumbnails='card' %}"
+            "{% for post in posts %}"
+            "{% post_card post %}{{ post.pk }}{% endpost_card %}"
+            "{% endfor %}"
+        )
+        template.render(Context({'posts': [post]}))
+        urls.assert_called_once()
+        self.assertEqual(urls.call_args[0][0], [post.image.name])
+        template.render(Context({'posts': [post]}))
+        urls.assert_called_once()
+
+
+class ImageSpecTest(SimpleTestCase):
+    def widths(self, *args):
+        return sorted({width for _, width, *_ in spec_variants(*args)})
+
+    def test_srcset_skips_widths_that_would_upscale(self):
+        """Тест: ширины больше исходника в srcset не попадают."""
+        self.assertEqual(self.widths('detail'), [480, 750, 1000])
+        self.assertEqual(self.widths('detail', 2000, 1000), [480, 750, 1000])
+        self.assertEqual(self.widths('detail', 600, 400), [480, 600])
+        self.assertEqual(self.widths('detail', 300, 200), [300])
+        # Карточки дополняются полями до квадрата: файлы все разные.
+        self.assertEqual(self.widths('card', 300, 200), [320, 480, 700])
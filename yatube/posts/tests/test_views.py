@@ -1,16 +1,22 @@
 import shutil
 import tempfile
+from unittest import mock
 
 from django import forms
 from django.conf import settings
 from django.contrib.auth import get_user_model
 from django.core.cache import cache
+from django.core.files.storage import default_storage
 from django.core.files.uploadedfile import SimpleUploadedFile
 from django.test import Client, TestCase, override_settings
 from django.urls import reverse
+from sorl.thumbnail import default
 
+from ..counters import reconcile_author_stats
 from ..forms import PostForm
-from ..models import Follow, Group, Post
+from ..models import Comment, Follow, Group, Post, TimelineEntry
+from ..thumbnails import (THUMBNAIL_SPECS, generate_thumbnails,
+                          get_spec_thumbnail, thumbnail_url)
 
 TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
 
@@ -176,6 +182,39 @@ class PostPagesTest(TestCase):
                 self.func_for_test_context(objects)
                 self.assertIn(self.post, resp_obj)
 
+    def test_unpublished_post_not_in_public_feeds(self):
+        """Тест: неодобренный пост не занимает место в публичных лентах."""
+        draft = Post.objects.create(
+            author=self.user,
+            text='Черновик',
+            group=self.group,
+        )
+        reverse_objects = [
+            reverse('posts:index'),
+            reverse('posts:group_list', kwargs={'slug': self.group.slug}),
+            reverse('posts:profile', kwargs={'username': self.user}),
+        ]
+        for reverse_name in reverse_objects:
+            with self.subTest(reverse_name=reverse_name):
+                response = self.authorized_client.get(reverse_name)
+                self.assertNotIn(draft, response.context['page_obj'])
+
+    def test_feed_pages_do_not_load_rich_text(self):
+        """Тест: ленты не читают из базы тяжёлые RichText-колонки."""
+        reverse_objects = [
+            reverse('posts:index'),
+            reverse('posts:group_list', kwargs={'slug': self.group.slug}),
+            reverse('posts:profile', kwargs={'username': self.user}),
+        ]
+        for reverse_name in reverse_objects:
+            with self.subTest(reverse_name=reverse_name):
+                response = self.authorized_client.get(reverse_name)
+                post = response.context['page_obj'][0]
+                self.assertTrue(
+                    {'text', 'text_html', 'description'}
+                    <= post.get_deferred_fields()
+                )
+
     def test_post_not_in_over_group(self):
         """Тест НЕ_нахождения поста в чужой группе."""
         reverse_name_group2 = reverse(
@@ -189,12 +228,157 @@ class PostPagesTest(TestCase):
         """Тестируем работу кэширования главной страницы index."""
         cache.clear()
         response = self.authorized_client.get(reverse('posts:index'))
+        # Только сессия и пользователь - для шапки.
+        with self.assertNumQueries(2):
+            response_cached = self.authorized_client.get(
+                reverse('posts:index'))
+        self.assertEqual(response.content, response_cached.content)
+
+    def test_feed_pages_are_shared_between_users(self):
+        """Тест: страница из кэша одна, куски пользователя - свои."""
+        url = reverse('posts:profile', kwargs={'username': self.user})
+        Follow.objects.create(user=self.author_new, author=self.user)
+        self.authorized_client.get(url)
+        # ETag, сессия, пользователь и его подписка на автора.
+        with self.assertNumQueries(4):
+            response = self.authorized_client_author_new.get(url)
+        self.assertContains(response, f'Пользователь: {self.author_new}')
+        self.assertNotContains(response, f'Пользователь: {self.user}')
+        self.assertContains(response, 'Отписаться')
+        self.assertNotContains(response, '<!--hole:')
+        response = self.client.get(url)
+        self.assertContains(response, 'Войти')
+        self.assertContains(response, 'Подписаться')
+
+    def test_post_detail_conditional_get(self):
+        """Тест: без изменений - 304 без шаблонов, комментарий - 200."""
+        url = reverse('posts:post_detail', kwargs={'post_id': self.post.id})
+        response = self.authorized_client.get(url)
+        etag = response['ETag']
+        # Дата правки не учитывает читателя и имена: только ETag.
+        self.assertNotIn('Last-Modified', response)
+        response = self.authorized_client.get(
+            url, HTTP_IF_MODIFIED_SINCE='Fri, 01 Jan 2100 00:00:00 GMT'
+        )
+        self.assertEqual(response.status_code, 200)
+        # Страница своя у каждого пользователя: общие кэши её не хранят.
+        self.assertIn('private', response['Cache-Control'])
+        self.assertIn('no-cache', response['Cache-Control'])
+        response = self.authorized_client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.templates, [])
+        response = self.authorized_client_author_new.get(
+            url, HTTP_IF_NONE_MATCH=etag
+        )
+        self.assertEqual(response.status_code, 200)
+        Comment.objects.create(
+            post=self.post, author=self.author_new, text='Комментарий'
+        )
+        response = self.authorized_client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
+    def test_profile_etag_changes_with_follow(self):
+        """Тест: подписка меняет ETag профиля."""
+        url = reverse('posts:profile', kwargs={'username': self.user})
+        etag = self.authorized_client_author_new.get(url)['ETag']
+        response = self.authorized_client_author_new.get(
+            url, HTTP_IF_NONE_MATCH=etag
+        )
+        self.assertEqual(response.status_code, 304)
+        Follow.objects.create(user=self.author_new, author=self.user)
+        response = self.authorized_client_author_new.get(
+            url, HTTP_IF_NONE_MATCH=etag
+        )
+        self.assertContains(response, 'Отписаться')
+
+    def test_index_cache_invalidated_by_write(self):
+        """Тест: после удаления поста главная страница сразу обновляется."""
+        cache.clear()
+        response = self.authorized_client.get(reverse('posts:index'))
         Post.objects.get(pk=self.post.id).delete()
         response_2 = self.authorized_client.get(reverse('posts:index'))
-        self.assertEqual(response.content, response_2.content)
+        self.assertNotEqual(response.content, response_2.content)
+        self.assertNotIn(self.post, response_2.context['page_obj'])
+
+    def test_index_cache_invalidated_by_author_rename(self):
+        """Тест: новое имя автора сразу видно на главной странице."""
         cache.clear()
-        response_cache = self.authorized_client.get(reverse('posts:index'))
-        self.assertNotEqual(response_2.content, response_cache.content)
+        self.authorized_client.get(reverse('posts:index'))
+        self.user.first_name = 'Переименованный'
+        self.user.save()
+        response = self.authorized_client.get(reverse('posts:index'))
+        self.assertContains(response, 'Переименованный')
+
+    def test_group_page_cache_invalidated_by_author_rename(self):
+        """Тест: новое имя автора сразу видно на странице группы."""
+        url = reverse('posts:group_list', kwargs={'slug': self.group.slug})
+        self.authorized_client.get(url)
+        self.user.first_name = 'Переименованный'
+        self.user.save()
+        self.assertContains(self.authorized_client.get(url), 'Переименованный')
+
+    def test_post_card_fragment_cached_until_group_changes(self):
+        """Тест: карточка поста берётся из кэша, пока не изменится группа."""
+        url = reverse('posts:profile', kwargs={'username': self.user})
+        self.authorized_client.get(url)
+        Post.objects.filter(pk=self.post.pk).update(excerpt='Текст мимо кэша')
+        response = self.authorized_client.get(url)
+        self.assertNotContains(response, 'Текст мимо кэша')
+        group = Group.objects.get(pk=self.group.pk)
+        group.title = 'Новое имя группы'
+        group.save()
+        response = self.authorized_client.get(url)
+        self.assertContains(response, 'Новое имя группы')
+        self.assertContains(response, 'Текст мимо кэша')
+
+    def test_thumbnails_pregenerated_for_new_image(self):
+        """Тест: новая картинка отдаётся в фон, правка текста - нет."""
+        with mock.patch(
+            'posts.signals.transaction.on_commit', lambda func: func()
+        ), mock.patch('posts.signals.pregenerate_thumbnails') as pregenerate:
+            post = Post.objects.create(
+                author=self.user,
+                text='Пост с картинкой',
+                image=SimpleUploadedFile(
+                    'other.gif', self.small_gif, content_type='image/gif'
+                )
+            )
+            post.text = 'Новый текст'
+            post.save()
+        pregenerate.assert_called_once_with(post.image.name)
+        names = generate_thumbnails(post.image.name)
+        self.assertEqual(len(names), len(THUMBNAIL_SPECS))
+        for name in names:
+            self.assertTrue(default_storage.exists(name))
+
+    def test_thumbnail_built_on_first_fetch(self):
+        """Тест: страница отдаёт подписанный адрес, миниатюра - по запросу."""
+        # LRU хранилища миниатюр живёт дольше транзакции теста.
+        default.kvstore.lru.clear()
+        url = thumbnail_url(self.post.image, 'detail-480-webp')
+        response = self.authorized_client.get(
+            reverse('posts:post_detail', kwargs={'post_id': self.post.id})
+        )
+        # Картинка 2x1: большие ширины без upscale дали бы тот же файл.
+        self.assertContains(response, f'{url} 2w')
+        self.assertNotContains(response, 'detail-1000-webp')
+        self.assertContains(response, 'type="image/webp"')
+        self.assertContains(response, 'loading="lazy"')
+        self.assertContains(response, 'width="2" height="1"')
+        self.assertContains(response, self.post.image_placeholder)
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(b''.join(response.streaming_content))
+        self.assertIn('immutable', response['Cache-Control'])
+        self.assertTrue(
+            get_spec_thumbnail(self.post.image.name, 'detail-480-webp')
+            .exists()
+        )
+        self.assertEqual(response['Content-Type'], 'image/webp')
+        response = self.client.get(
+            url.replace('detail-480-webp', 'card-700-webp')
+        )
+        self.assertEqual(response.status_code, 404)
 
     def test_authorized_user_follow_unfollow_author(self):
         """
@@ -232,6 +416,28 @@ class PostPagesTest(TestCase):
         self.func_for_test_context(objects)
         self.assertContains(response, self.post)
 
+    def test_timeline_filled_on_publish_and_pruned_on_unfollow(self):
+        """
+        Тест: пост попадает в ленту подписчика после публикации,
+        отписка чистит ленту.
+        """
+        Follow.objects.create(user=self.author_new, author=self.user)
+        new_post = Post.objects.create(
+            author=self.user,
+            text='Пост после подписки',
+        )
+        timeline = TimelineEntry.objects.filter(user=self.author_new)
+        self.assertFalse(timeline.filter(post=new_post).exists())
+        new_post.is_published = True
+        new_post.save()
+        self.assertEqual(
+            set(timeline.values_list('post_id', flat=True)),
+            {self.post.pk, new_post.pk}
+        )
+        self.authorized_client_author_new.get(reverse(
+            'posts:profile_unfollow', kwargs={'username': self.user}))
+        self.assertFalse(timeline.exists())
+
     def test_there_is_no_post_in_feed_of_not_follower(self):
         """
         Тест добавленный пост отсутствует в ленте у не подписчика.
@@ -256,11 +462,15 @@ class PaginatorViewsTest(TestCase):
                 Post(
                     text=f'Тестовые посты номер {n}',
                     author=cls.user,
-                    group=cls.group
+                    group=cls.group,
+                    is_published=True
                 )
                 for n in range(NUMBER_POSTS)
             ]
         )
+        # bulk_create минует сигналы - пересчитываем счётчики как после
+        # массовой загрузки.
+        reconcile_author_stats()
 
     def setUp(self):
         self.guest_client = Client()
@@ -294,3 +504,30 @@ class PaginatorViewsTest(TestCase):
     def test_second_page_contains_three_records(self):
         """Проверка: на второй странице должно быть три поста."""
         self.pagination_test_setup('?page=2', NUMBER_POSTS_SECOND_PAGE)
+
+    def test_cursor_pages_walk_forward_and_back(self):
+        """Проверка: курсорная пагинация ходит вперёд и назад без дублей."""
+        url = reverse('posts:index')
+        first = self.guest_client.get(url).context['page_obj']
+        self.assertFalse(first.has_previous())
+        self.assertTrue(first.has_next())
+        second = self.guest_client.get(
+            url, {'after': first.next_cursor()}).context['page_obj']
+        self.assertEqual(len(second), NUMBER_POSTS_SECOND_PAGE)
+        self.assertFalse(second.has_next())
+        self.assertTrue(second.has_previous())
+        seen = [post.pk for post in first] + [post.pk for post in second]
+        self.assertEqual(len(set(seen)), NUMBER_POSTS)
+        back = self.guest_client.get(
+            url, {'before': second.previous_cursor()}).context['page_obj']
+        self.assertEqual(
+            [post.pk for post in back], [post.pk for post in first]
+        )
+
+    def test_broken_cursor_shows_first_page(self):
+        """Проверка: испорченный курсор открывает первую страницу."""
+        response = self.guest_client.get(
+            reverse('posts:index'), {'after': 'not-a-cursor'})
+        self.assertEqual(
+            len(response.context['page_obj']), NUMBER_POSTS_FIRST_PAGE
+        )
@@ -0,0 +1,103 @@
+"""Обработка HTML из CKEditor: очистка и короткий текст для карточек."""
+import html
+import re
+from html.parser import HTMLParser
+
+from django.utils.html import escape, strip_tags
+from django.utils.text import Truncator
+
+EXCERPT_LENGTH = 60
+
+ALLOWED_TAGS = {
+    'a', 'b', 'blockquote', 'br', 'code', 'div', 'em', 'h1', 'h2', 'h3',
+    'h4', 'h5', 'h6', 'hr', 'i', 'img', 'li', 'ol', 'p', 'pre', 's', 'span',
+    'strike', 'strong', 'sub', 'sup', 'table', 'tbody', 'td', 'th', 'thead',
+    'tr', 'u', 'ul',
+}
+VOID_TAGS = {'br', 'hr', 'img'}
+# Содержимое этих тегов выбрасывается целиком, а не только сами теги
+DROP_CONTENT_TAGS = {'script', 'style', 'iframe', 'object', 'embed'}
+ALLOWED_ATTRIBUTES = {
+    'a': {'href', 'title'},
+    'img': {'src', 'alt', 'width', 'height'},
+    'td': {'colspan', 'rowspan'},
+    'th': {'colspan', 'rowspan'},
+}
+URL_ATTRIBUTES = {'href', 'src'}
+SAFE_URL = re.compile(r'^(https?://|mailto:|/|#|[^:]*$)', re.IGNORECASE)
+# Границы блоков превращаются в пробелы, чтобы абзацы не слипались
+BLOCK_TAG = re.compile(
+    r'</?(?:blockquote|br|div|h[1-6]|hr|li|p|pre|td|th|tr)\b[^>]*>'
+)
+
+
+class _Sanitizer(HTMLParser):
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.parts = []
+        self.open_tags = []
+        self.dropping = 0
+
+    def handle_starttag(self, tag, attrs):
+        if tag in DROP_CONTENT_TAGS:
+            self.dropping += 1
+            return
+        if self.dropping or tag not in ALLOWED_TAGS:
+            return
+        allowed = ALLOWED_ATTRIBUTES.get(tag, set())
+        rendered = ''.join(
+            f' {name}="{escape(value)}"'
+            for name, value in attrs
+            if name in allowed and value is not None and (
+                name not in URL_ATTRIBUTES or SAFE_URL.match(value.strip())
+            )
+        )
+        self.parts.append(f'<{tag}{rendered}>')
+        if tag not in VOID_TAGS:
+            self.open_tags.append(tag)
+
+    def handle_startendtag(self, tag, attrs):
+        self.handle_starttag(tag, attrs)
+        if tag not in VOID_TAGS and self.open_tags[-1:] == [tag]:
+            self.handle_endtag(tag)
+
+    def handle_endtag(self, tag):
+        if tag in DROP_CONTENT_TAGS:
+            self.dropping = max(self.dropping - 1, 0)
+            return
+        if self.dropping or tag not in self.open_tags:
+            return
+        while self.open_tags:
+            opened = self.open_tags.pop()
+            self.parts.append(f'</{opened}>')
+            if opened == tag:
+                break
+
+    def handle_data(self, data):
+        if not self.dropping:
+            self.parts.append(escape(data))
+
+    def result(self):
+        self.close()
+        closing = ''.join(f'</{tag}>' for tag in reversed(self.open_tags))
+        return ''.join(self.parts) + closing
+
+
+def sanitize_html(value):
+    """HTML только из разрешённых тегов и атрибутов, без скриптов."""
+    sanitizer = _Sanitizer()
+    sanitizer.feed(value or '')
+    return sanitizer.result()
+
+
+def plain_text(value):
+    """Текст из HTML CKEditor без тегов, сущностей и скриптов."""
+    spaced = BLOCK_TAG.sub(' ', sanitize_html(value))
+    return html.unescape(strip_tags(spaced))
+
+
+def make_excerpt(value, length=EXCERPT_LENGTH):
+    """Короткий текст для карточки ленты."""
+    text = ' '.join(plain_text(value).split())
+    return Truncator(text).chars(length)
@@ -0,0 +1,270 @@
+import logging
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+
+from django.conf import settings
+from django.core.signing import Signer
+from django.db import connections
+from django.urls import reverse
+from django.utils.crypto import constant_time_compare
+from sorl.thumbnail import default, get_thumbnail
+from sorl.thumbnail.conf import defaults as thumbnail_defaults
+from sorl.thumbnail.conf import settings as thumbnail_settings
+from sorl.thumbnail.images import ImageFile
+
+from .sorl_compat import create_thumbnail, thumbnail_filename
+
+logger = logging.getLogger(__name__)
+
+# Картинки поста в шаблонах: геометрия sorl для каждой ширины, опции,
+# ширины для srcset и подсказка sizes для браузера. Маленькие исходники
+# не растягиваются - браузер сам подгонит картинку под колонку.
+IMAGE_SPECS = {
+    'card': {
+        'geometry': '{width}x{width}',
+        'options': {'padding': True, 'upscale': False},
+        'widths': (320, 480, 700),
+        'sizes': '(min-width: 768px) 25vw, 100vw',
+    },
+    'detail': {
+        'geometry': '{width}x750',
+        'options': {'upscale': False},
+        'widths': (480, 750, 1000),
+        'sizes': '(min-width: 768px) 75vw, 100vw',
+    },
+}
+
+# Форматы каждой ширины: (формат sorl, MIME-тип, опции).
+# Последний - запасной для <img>, остальные идут в <source>.
+IMAGE_FORMATS = (
+    ('WEBP', 'image/webp', {'quality': 80}),
+    ('JPEG', 'image/jpeg', {}),
+)
+
+
+def variant_name(spec, width, format_):
+    return f'{spec}-{width}-{format_.lower()}'
+
+
+# Все варианты миниатюр: имя варианта -> (геометрия, опции sorl).
+THUMBNAIL_SPECS = {
+    variant_name(spec, width, format_): (
+        definition['geometry'].format(width=width),
+        {**definition['options'], **options, 'format': format_},
+    )
+    for spec, definition in IMAGE_SPECS.items()
+    for width in definition['widths']
+    for format_, _, options in IMAGE_FORMATS
+}
+
+# Адрес миниатюры зависит только от картинки и размера,
+# поэтому браузер может хранить ответ сколько угодно.
+THUMBNAIL_MAX_AGE = 60 * 60 * 24 * 365
+
+_signer = Signer(salt='posts.thumbnails')
+
+
+def _scaled_size(definition, variant_width, width, height):
+    """Размер файла варианта variant_width для картинки width x height."""
+    geometry = definition['geometry'].format(width=variant_width)
+    box_width, box_height = (int(side) for side in geometry.split('x'))
+    if definition['options'].get('padding'):
+        return box_width, box_height
+    if not width or not height:
+        return None
+    scale = min(box_width / width, box_height / height)
+    if not definition['options'].get('upscale', True):
+        scale = min(scale, 1)
+    return max(1, round(width * scale)), max(1, round(height * scale))
+
+
+def spec_variants(spec, width=None, height=None):
+    """
+    [(вариант, ширина, формат, MIME-тип)] размера spec. Для картинки
+    известного размера width x height ширины, которые без upscale дали бы
+    тот же файл, что и меньшая, пропускаются, а ширина - ширина файла.
+    """
+    definition = IMAGE_SPECS[spec]
+    variants = []
+    sizes = set()
+    for variant_width in definition['widths']:
+        size = _scaled_size(definition, variant_width, width, height)
+        if size in sizes:
+            continue
+        if size:
+            sizes.add(size)
+        variants.extend(
+            (
+                variant_name(spec, variant_width, format_),
+                size[0] if size else variant_width, format_, mime_type
+            )
+            for format_, mime_type, _ in IMAGE_FORMATS
+        )
+    return variants
+
+
+def display_size(spec, width, height):
+    """
+    Размер самого крупного варианта spec для картинки width x height -
+    для атрибутов width/height, которые резервируют место на странице.
+    """
+    definition = IMAGE_SPECS[spec]
+    return _scaled_size(
+        definition, max(definition['widths']), width, height
+    )
+
+
+def get_spec_thumbnail(image, spec):
+    geometry, options = THUMBNAIL_SPECS[spec]
+    return get_thumbnail(image, geometry, **options)
+
+
+def _thumbnail_options(spec):
+    """Опции варианта, дополненные так же, как в get_thumbnail sorl."""
+    geometry, options = THUMBNAIL_SPECS[spec]
+    options = dict(options)
+    backend = default.backend
+    for key, value in backend.default_options.items():
+        options.setdefault(key, value)
+    for key, attr in backend.extra_options:
+        value = getattr(thumbnail_settings, attr)
+        if value != getattr(thumbnail_defaults, attr):
+            options.setdefault(key, value)
+    return geometry, options
+
+
+def spec_thumbnail_file(name, spec):
+    """Файл миниатюры с тем именем, которое даст sorl, без чтения картинки."""
+    geometry, options = _thumbnail_options(spec)
+    return ImageFile(
+        thumbnail_filename(ImageFile(name), geometry, options),
+        default.storage
+    )
+
+
+def thumbnail_signature(name, spec):
+    return _signer.signature(f'{spec}:{name}')
+
+
+def check_thumbnail_signature(name, spec, signature):
+    return spec in THUMBNAIL_SPECS and constant_time_compare(
+        signature, thumbnail_signature(name, spec)
+    )
+
+
+def thumbnail_url(image, spec):
+    """
+    Подписанный адрес миниатюры. Картинку не открывает:
+    миниатюру построит posts:thumbnail при первом запросе.
+    """
+    name = getattr(image, 'name', image)
+    return reverse('posts:thumbnail', kwargs={
+        'signature': thumbnail_signature(name, spec),
+        'spec': spec,
+        'name': name,
+    })
+
+
+def thumbnail_urls(names, specs):
+    """
+    Адреса вариантов specs для картинок names одним обращением
+    к хранилищу sorl: {(картинка, вариант): адрес}. Готовые миниатюры -
+    прямые адреса в media, остальные - подписанные thumbnail_url.
+    """
+    files = {
+        (name, spec): spec_thumbnail_file(name, spec)
+        for name in names for spec in specs
+    }
+    known = default.kvstore.get_many(files.values())
+    return {
+        (name, spec): (
+            known[image.key].url if image.key in known
+            else thumbnail_url(name, spec)
+        )
+        for (name, spec), image in files.items()
+    }
+
+
+def generate_thumbnails(name):
+    """
+    Строит все варианты из THUMBNAIL_SPECS для файла картинки,
+    раскодировав исходник один раз.
+    Ошибки только пишутся в лог: недостающее построит posts:thumbnail.
+    """
+    source = ImageFile(name)
+    try:
+        source_image = default.engine.get_image(source)
+    except Exception:
+        logger.exception('Cannot open image %s', name)
+        return []
+    created = []
+    try:
+        source.set_size(default.engine.get_image_size(source_image))
+        image_info = default.engine.get_image_info(source_image)
+        default.kvstore.get_or_set(source)
+        for spec in THUMBNAIL_SPECS:
+            thumbnail = spec_thumbnail_file(name, spec)
+            try:
+                if not thumbnail.exists():
+                    geometry, options = _thumbnail_options(spec)
+                    options['image_info'] = image_info
+                    create_thumbnail(
+                        source_image, geometry, options, thumbnail
+                    )
+                default.kvstore.set(thumbnail, source)
+            except Exception:
+                logger.exception('Thumbnail %s for %s failed', spec, name)
+            else:
+                created.append(thumbnail.name)
+    finally:
+        default.engine.cleanup(source_image)
+    return created
+
+
+def _init_worker(settings_module, overrides):
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', settings_module)
+    # До setup(): приложения при загрузке могут открыть соединение.
+    for name, value in overrides.items():
+        setattr(settings, name, value)
+    import django
+    django.setup()
+
+
+def _worker_overrides():
+    """
+    Воркер берёт базу, каталог медиа и кэши у родителя, а не из модуля
+    настроек: тесты подменяют всё это.
+    """
+    return {
+        'DATABASES': {
+            alias: connections[alias].settings_dict for alias in connections
+        },
+        'MEDIA_ROOT': settings.MEDIA_ROOT,
+        'CACHES': settings.CACHES,
+    }
+
+
+@lru_cache(maxsize=None)
+def get_executor():
+    """
+    Пул создаётся при первой картинке. Процессы стартуют через spawn,
+    чтобы не унаследовать открытые соединения с базой.
+    """
+    return ProcessPoolExecutor(
+        max_workers=settings.THUMBNAIL_PREGENERATE_WORKERS,
+        mp_context=multiprocessing.get_context('spawn'),
+        initializer=_init_worker,
+        initargs=(
+            os.environ.get('DJANGO_SETTINGS_MODULE', 'yatube.settings'),
+            _worker_overrides(),
+        ),
+    )
+
+
+def pregenerate_thumbnails(name):
+    """Отдаёт построение миниатюр пулу процессов, не дожидаясь результата."""
+    if not settings.THUMBNAIL_PREGENERATE:
+        return None
+    return get_executor().submit(generate_thumbnails, name)
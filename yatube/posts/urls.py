@@ -36,4 +36,9 @@ urlpatterns = [
         name='delete_comment'
     ),
     path('search/', views.SearchResultsView.as_view(), name="search_results"),
+    path(
+        'thumbnails/<str:signature>/<str:spec>/<path:name>',
+        views.thumbnail,
+        name='thumbnail'
+    ),
 ]
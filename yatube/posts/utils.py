@@ -1,12 +1,202 @@
+import base64
+import binascii
+import json
+
 from django.conf import settings
-from django.core.paginator import Paginator
+from django.core.paginator import Page, Paginator
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+
+
+def encode_cursor(values):
+    """
+    Pack key values of a row into an opaque url-safe token
+    """
+    raw = json.dumps(values, default=str, separators=(',', ':'))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_cursor(token):
+    """
+    Unpack a token made by encode_cursor, None if the token is broken
+    """
+    if not token:
+        return None
+    padding = '=' * (-len(token) % 4)
+    try:
+        raw = base64.urlsafe_b64decode((token + padding).encode())
+        values = json.loads(raw.decode())
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        return None
+    if not isinstance(values, list):
+        return None
+    return values
+
+
+def decode_keyset_cursor(token):
+    """
+    (date, id) from a keyset token, None if the token is broken
+    """
+    values = decode_cursor(token)
+    if values is None or len(values) != 2:
+        return None
+    stamp, pk = parse_datetime(str(values[0])), values[1]
+    if stamp is None or not isinstance(pk, int):
+        return None
+    return stamp, pk
+
+
+class CursorPage(Page):
+    """
+    Page of keyset pagination: knows only its neighbours, not its number
+    """
+
+    is_cursor = True
+
+    def __init__(self, object_list, paginator, has_next, has_previous):
+        super().__init__(object_list, None, paginator)
+        # An empty page has no rows to build neighbour cursors from.
+        has_next = has_next and bool(object_list)
+        has_previous = has_previous and bool(object_list)
+        self._has_next = has_next
+        self._has_previous = has_previous
+        # Cursors are taken from the rows before views may swap
+        # object_list for related objects (timeline entries -> posts).
+        self._next_cursor = (
+            paginator.cursor_for(object_list[-1]) if has_next else None
+        )
+        self._previous_cursor = (
+            paginator.cursor_for(object_list[0]) if has_previous else None
+        )
+
+    def __repr__(self):
+        return '<Cursor page>'
+
+    def has_next(self):
+        return self._has_next
+
+    def has_previous(self):
+        return self._has_previous
+
+    def next_cursor(self):
+        return self._next_cursor
+
+    def previous_cursor(self):
+        return self._previous_cursor
+
+    def start_index(self):
+        return None
+
+    def end_index(self):
+        return None
+
+
+class CursorPaginator(Paginator):
+    """
+    Keyset pagination over (date, id) newest first.
+    Every page is one indexed range query without COUNT(*) and OFFSET.
+    """
+
+    def __init__(self, object_list, per_page,
+                 date_field='pub_date', id_field='id'):
+        super().__init__(object_list, per_page)
+        self.date_field = date_field
+        self.id_field = id_field
+
+    def cursor_for(self, obj):
+        return encode_cursor([
+            getattr(obj, self.date_field).isoformat(),
+            getattr(obj, self.id_field),
+        ])
+
+    def _keyset(self, cursor, older):
+        stamp, pk = cursor
+        lookup = 'lt' if older else 'gt'
+        return Q(**{f'{self.date_field}__{lookup}': stamp}) | Q(**{
+            self.date_field: stamp,
+            f'{self.id_field}__{lookup}': pk,
+        })
+
+    def get_cursor_page(self, after=None, before=None):
+        after = decode_keyset_cursor(after)
+        before = decode_keyset_cursor(before)
+        newest_first = (f'-{self.date_field}', f'-{self.id_field}')
+        oldest_first = (self.date_field, self.id_field)
+        if before is not None:
+            rows = list(
+                self.object_list
+                .filter(self._keyset(before, older=False))
+                .order_by(*oldest_first)[:self.per_page + 1]
+            )
+            has_previous = len(rows) > self.per_page
+            rows = rows[:self.per_page][::-1]
+            return CursorPage(rows, self, True, has_previous)
+        queryset = self.object_list
+        if after is not None:
+            queryset = queryset.filter(self._keyset(after, older=True))
+        rows = list(queryset.order_by(*newest_first)[:self.per_page + 1])
+        has_next = len(rows) > self.per_page
+        return CursorPage(
+            rows[:self.per_page], self, has_next, after is not None
+        )
+
+
+class RankedCursorPaginator(Paginator):
+    """
+    Cursor pagination over an already ranked list (search results):
+    a token points at the id of the neighbouring item.
+    """
+
+    def __init__(self, object_list, per_page, key=lambda item: item.pk):
+        super().__init__(object_list, per_page)
+        self.key = key
+
+    def cursor_for(self, obj):
+        return encode_cursor([self.key(obj)])
+
+    def _position(self, token):
+        values = decode_cursor(token)
+        if not values or len(values) != 1:
+            return None
+        for position, item in enumerate(self.object_list):
+            if self.key(item) == values[0]:
+                return position
+        return None
+
+    def get_cursor_page(self, after=None, before=None):
+        start = 0
+        after, before = self._position(after), self._position(before)
+        if before is not None:
+            start = max(before - self.per_page, 0)
+        elif after is not None:
+            start = after + 1
+        end = start + self.per_page
+        return CursorPage(
+            self.object_list[start:end],
+            self,
+            has_next=end < len(self.object_list),
+            has_previous=start > 0
+        )
 
 
-def paginator_page(request, queryset):
+def paginator_page(request, queryset, date_field='pub_date', id_field='id',
+                   count=None):
     """
-    Make paginator for templates with queryset
+    Make paginator for templates with queryset.
+    ?after= / ?before= tokens use keyset pagination,
+    ?page= falls back to classic page numbers.
+    A stored count saves the classic paginator its COUNT(*).
     """
-    paginator = Paginator(queryset, settings.POSTS_PER_PAGE)
     page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
-    return page_obj
+    if settings.PAGINATION_MODE == 'page' or page_number is not None:
+        paginator = Paginator(queryset, settings.POSTS_PER_PAGE)
+        if count is not None:
+            paginator.count = count
+        return paginator.get_page(page_number)
+    paginator = CursorPaginator(
+        queryset, settings.POSTS_PER_PAGE, date_field, id_field
+    )
+    return paginator.get_cursor_page(
+        after=request.GET.get('after'),
+        before=request.GET.get('before'),
+    )
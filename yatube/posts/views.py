@@ -1,17 +1,31 @@
+from core.cache.decorators import hole_punched_cache_page
+from django.conf import settings
 from django.contrib.auth.decorators import login_required
-from django.db.models import Q
+from django.core.files.storage import default_storage
+from django.http import FileResponse, Http404
 from django.shortcuts import get_object_or_404, redirect, render
-from django.views.decorators.cache import cache_page
+from django.utils.cache import patch_cache_control
+from django.views.decorators.cache import cache_control
+from django.views.decorators.http import condition, require_safe
 from django.views.generic import ListView
 
+from .conditional import group_posts_etag, post_detail_etag, profile_etag
 from .forms import CommentForm, PostForm
-from .models import Comment, Group, Post, User, Follow
-from .utils import paginator_page
-
-
-@cache_page(5, key_prefix='index_page')
+from .models import (FEED_FIELDS, Comment, Follow, Group, Post, TimelineEntry,
+                     User)
+from .search import search_posts
+from .thumbnails import (THUMBNAIL_MAX_AGE, check_thumbnail_signature,
+                         get_spec_thumbnail)
+from .utils import RankedCursorPaginator, paginator_page
+
+
+# Карточки показывают имена авторов: их правка - поколение 'users'.
+@hole_punched_cache_page(
+    settings.INDEX_PAGE_CACHE_TIMEOUT, 'index_page',
+    generation=('posts', 'users')
+)
 def index(request):
-    posts = Post.objects.select_related("group")
+    posts = Post.published.for_feed()
     page_obj = paginator_page(request, posts)
 
     template = 'posts/index.html'
@@ -21,10 +35,16 @@ def index(request):
     return render(request, template, context)
 
 
+@cache_control(private=True, no_cache=True)
+@condition(etag_func=group_posts_etag)
+@hole_punched_cache_page(
+    settings.FEED_PAGE_CACHE_TIMEOUT, 'group_page',
+    generation=('posts', 'users')
+)
 def group_posts(request, slug):
 
     group = get_object_or_404(Group, slug=slug)
-    posts = group.groups.filter(group=group)
+    posts = group.groups(manager='published').for_feed()
     page_obj = paginator_page(request, posts)
     template = 'posts/group_list.html'
     context = {
@@ -34,29 +54,38 @@ def group_posts(request, slug):
     return render(request, template, context)
 
 
+@cache_control(private=True, no_cache=True)
+@condition(etag_func=profile_etag)
+@hole_punched_cache_page(
+    settings.FEED_PAGE_CACHE_TIMEOUT, 'profile_page',
+    generation=('posts', 'follows', 'users')
+)
 def profile(request, username):
 
-    author = get_object_or_404(User, username=username)
-    posts = author.posts.all()
-    page_obj = paginator_page(request, posts)
-    if request.user.is_authenticated:
-        following = Follow.objects.filter(
-            user=request.user, author=author
-        ).exists
-    else:
-        following = False
+    author = get_object_or_404(
+        User.objects.select_related('stats'), username=username
+    )
+    stats = getattr(author, 'stats', None)
+    posts = author.posts(manager='published').for_feed()
+    page_obj = paginator_page(
+        request, posts, count=stats.published_posts_count if stats else None
+    )
     template = 'posts/profile.html'
     context = {
         'page_obj': page_obj,
         'author': author,
-        'following': following
+        'stats': stats,
     }
     return render(request, template, context)
 
 
+@cache_control(private=True, no_cache=True)
+@condition(etag_func=post_detail_etag)
 def post_detail(request, post_id):
 
-    post = Post.objects.get(id=post_id)
+    post = get_object_or_404(
+        Post.objects.select_related('author__stats', 'group'), id=post_id
+    )
     template = 'posts/post_detail.html'
     form = CommentForm(request.POST or None)
     comments = post.comments.all()
@@ -128,12 +157,14 @@ def post_edit(request, post_id):
 
 @login_required
 def follow_index(request):
-    posts = (
-        Post.objects
-        .select_related('author', 'group')
-        .filter(author__following__user=request.user)
+    entries = (
+        TimelineEntry.objects
+        .filter(user=request.user)
+        .select_related('post__author', 'post__group')
+        .only('pub_date', 'post', *(f'post__{f}' for f in FEED_FIELDS))
     )
-    page_obj = paginator_page(request, posts)
+    page_obj = paginator_page(request, entries, id_field='post_id')
+    page_obj.object_list = [entry.post for entry in page_obj.object_list]
     template = 'posts/follow.html'
     context = {
         'page_obj': page_obj
@@ -181,9 +212,50 @@ class SearchResultsView(ListView):
     template_name = 'search_results.html'
 
     def get_queryset(self):
-        query = self.request.GET.get('q')
-        object_list = Post.objects.filter(
-            Q(text__icontains=query) | Q(
-                author__username__icontains=query)
+        self.query = self.request.GET.get('q', '').strip()
+        return search_posts(self.query, settings.SEARCH_RESULTS_LIMIT)
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        paginator = RankedCursorPaginator(
+            self.object_list,
+            settings.POSTS_PER_PAGE,
+            key=lambda hit: hit.post_id
         )
-        return object_list
+        page_obj = paginator.get_cursor_page(
+            after=self.request.GET.get('after'),
+            before=self.request.GET.get('before'),
+        )
+        hits = page_obj.object_list
+        posts = Post.published.in_bulk([hit.post_id for hit in hits])
+        page_obj.object_list = []
+        for hit in hits:
+            post = posts.get(hit.post_id)
+            if post is not None:
+                post.snippet = hit.snippet
+                page_obj.object_list.append(post)
+        context.update({
+            'page_obj': page_obj,
+            'query': self.query,
+        })
+        return context
+
+
+@require_safe
+def thumbnail(request, signature, spec, name):
+    """
+    Миниатюра по подписанному адресу из thumbnail_url:
+    строится при первом запросе и кладётся в media/cache.
+    """
+    if not check_thumbnail_signature(name, spec, signature):
+        raise Http404
+    if not default_storage.exists(name):
+        raise Http404
+    image = get_spec_thumbnail(name, spec)
+    if not image.exists():
+        raise Http404
+    response = FileResponse(image.storage.open(image.name))
+    patch_cache_control(
+        response, public=True, max_age=THUMBNAIL_MAX_AGE, immutable=True
+    )
+    return response
@@ -13,6 +13,17 @@ https://docs.djangoproject.com/en/2.2/ref/settings/
 import os
 
 POSTS_PER_PAGE = 10
+# 'cursor' - keyset pagination by ?after=/?before=, 'page' - classic ?page=N
+PAGINATION_MODE = 'cursor'
+# Больше этого поиск не отдаёт, даже если совпадений больше
+SEARCH_RESULTS_LIMIT = 200
+# Сколько секунд листание результатов поиска не повторяет запрос
+SEARCH_CACHE_TIMEOUT = 60
+# Картинка поста при загрузке вписывается в этот размер,
+# а больше POST_IMAGE_MAX_PIXELS пикселей не принимается вовсе.
+POST_IMAGE_MAX_SIZE = (2560, 2560)
+POST_IMAGE_MAX_PIXELS = 40 * 10 ** 6
+
 # Build paths inside the project like this: os.path.join(BASE_DIR, ...)
 
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
@@ -55,12 +66,59 @@ SECRET_KEY = 'r^mz7j72joc_5f$*%cdsvt=po^(^r16vox=oupg*_u)_0^ofqh'
 # SECURITY WARNING: don't run with debug turned on in production!
 DEBUG = True
 
+# Файлы кэша хранят pickle: каталог создаётся при первом обращении
+# и доступен только владельцу. Тесты переносят его во временный
+# (core.testing), не трогая кэш dev-сервера.
+CACHE_DIR = os.environ.get(
+    'YATUBE_CACHE_DIR', os.path.join(BASE_DIR, 'cache')
+)
+
+# default - L1 в памяти процесса перед общим для всех процессов машины
+# файлом SQLite (L2). Об изменениях процессы узнают по счётчику
+# версий в CHANNEL и очищают свой L1.
 CACHES = {
     'default': {
-        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
-    }
+        'BACKEND': 'core.cache.backends.tiered.TieredCache',
+        'OPTIONS': {
+            'L1': 'local',
+            'L2': 'shared',
+            'L1_TIMEOUT': 10,
+            'CHANNEL': os.path.join(CACHE_DIR, 'version'),
+        },
+    },
+    'shared': {
+        'BACKEND': 'core.cache.backends.sqlite.SQLiteCache',
+        'LOCATION': os.path.join(CACHE_DIR, 'cache.sqlite3'),
+        'OPTIONS': {
+            'MAX_BYTES': 128 * 1024 * 1024,
+        },
+    },
+    # L1: LRU с бюджетом в байтах и счётчиками по префиксам ключей
+    # (/metrics/cache/).
+    'local': {
+        'BACKEND': 'core.cache.backends.memory.MemoryCache',
+        'LOCATION': 'local',
+        'OPTIONS': {
+            'MAX_BYTES': 32 * 1024 * 1024,
+        },
+    },
 }
 
+# Сколько секунд после срока страница ещё отдаётся устаревшей,
+# пока один процесс её перестраивает (core.cache.stampede)
+CACHE_STALE_TIMEOUT = 60
+# Дольше перестройку ждать не будут: построят сами
+CACHE_REBUILD_LOCK_TIMEOUT = 10
+# Насколько рано начинать перестройку до срока: 0 - не раньше срока
+CACHE_XFETCH_BETA = 1.0
+
+# Главная страница сбрасывается по сигналам моделей, а не по таймауту
+INDEX_PAGE_CACHE_TIMEOUT = 60 * 60 * 24
+# Группы и профили: общая для всех страница, сбрасывается поколениями
+FEED_PAGE_CACHE_TIMEOUT = 60 * 60 * 24
+# Карточки постов в лентах, версия берётся из поколений поста/группы/автора
+POST_CARD_CACHE_TIMEOUT = 60 * 60 * 24
+
 ALLOWED_HOSTS = [
     'localhost',
     '127.0.0.1',
@@ -108,6 +166,8 @@ MIDDLEWARE = [
 
 ROOT_URLCONF = 'yatube.urls'
 
+TEST_RUNNER = 'core.testing.TemporaryCacheRunner'
+
 TEMPLATES = [
     {
         'BACKEND': 'django.template.backends.django.DjangoTemplates',
@@ -177,6 +237,13 @@ USE_L10N = True
 USE_TZ = True
 
 THUMBNAIL_DEBUG = True
+# Миниатюры из posts.thumbnails.THUMBNAIL_SPECS строятся в фоне
+# пулом процессов сразу после сохранения картинки поста.
+THUMBNAIL_PREGENERATE = True
+THUMBNAIL_PREGENERATE_WORKERS = 2
+# Метаданные миниатюр: LRU в памяти процесса перед кэшем и базой.
+THUMBNAIL_KVSTORE = 'posts.kvstore.KVStore'
+THUMBNAIL_KVSTORE_LRU_SIZE = 4096
 
 CKEDITOR_CONFIGS = {
     'default': {